@@ -0,0 +1,11 @@
+import pytest
+from django.core.cache import cache
+
+from posts.query_budget import query_budget as _query_budget
+
+
+@pytest.fixture
+def query_budget(db):
+    """Бюджет запросов страницы по имени URL, при пустом кэше."""
+    cache.clear()
+    return _query_budget
@@ -0,0 +1,29 @@
+import pytest
+from django.urls import reverse
+
+
+class TestQueryBudget:
+
+    @pytest.mark.parametrize('url_name, args', [
+        ('posts:main_page', []),
+        ('posts:group_posts', ['test-link']),
+        ('posts:profile', ['TestUser']),
+    ])
+    def test_feeds_within_budget(self, client, few_posts_with_group,
+                                 query_budget, url_name, args):
+        with query_budget(url_name):
+            response = client.get(reverse(url_name, args=args))
+        assert response.status_code == 200
+
+    def test_post_detail_within_budget(self, user_client, post, query_budget):
+        with query_budget('posts:post_detail'):
+            response = user_client.get(
+                reverse('posts:post_detail', args=[post.id]))
+        assert response.status_code == 200
+
+    def test_follow_index_within_budget(
+            self, user_client, another_few_posts_with_group_with_follower,
+            query_budget):
+        with query_budget('posts:follow_index'):
+            response = user_client.get(reverse('posts:follow_index'))
+        assert response.status_code == 200
@@ -4,7 +4,7 @@ from django.urls import reverse
 
 class StaticPagesViewTests(TestCase):
     def setUp(self):
-        super().setUpClass()
+        super().setUp()
         self.guest_client = Client()
 
     def test_pages_about_uses_correct_template(self):
@@ -0,0 +1,72 @@
+import base64
+import pickle
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.db import DatabaseCache as BaseDatabaseCache
+from django.db import DatabaseError, connections, router, transaction
+from django.utils import timezone
+
+# Три параметра на строку: пачка укладывается в 999 параметров SQLite.
+BATCH_SIZE = 300
+
+
+class DatabaseCache(BaseDatabaseCache):
+    """Кэш в базе, в котором set_many пишет все ключи одним запросом.
+
+    Штатный бэкенд сохраняет каждый ключ отдельно: подсчет строк, чтение
+    старого значения и INSERT или UPDATE. Карточки постов ленты пишутся
+    пачкой, поэтому здесь пачка сохраняется одним INSERT ... ON CONFLICT
+    (SQLite 3.24+ и PostgreSQL) после одной проверки размера таблицы.
+    """
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = []
+        items = list(data.items())
+        for start in range(0, len(items), BATCH_SIZE):
+            batch = dict(items[start:start + BATCH_SIZE])
+            if not self._set_batch(batch, timeout, version):
+                failed += batch
+        return failed
+
+    def _set_batch(self, data, timeout, version):
+        db = router.db_for_write(self.cache_model_class)
+        connection = connections[db]
+        expires = connection.ops.adapt_datetimefield_value(
+            self._expires(timeout))
+        params = []
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            params += [key, base64.b64encode(
+                pickle.dumps(value, self.pickle_protocol)
+            ).decode('latin1'), expires]
+        table = connection.ops.quote_name(self._table)
+        placeholders = ', '.join(['(%s, %s, %s)'] * len(data))
+        try:
+            with transaction.atomic(using=db), connection.cursor() as cursor:
+                cursor.execute(f'SELECT COUNT(*) FROM {table}')
+                if cursor.fetchone()[0] > self._max_entries:
+                    self._cull(
+                        db, cursor, timezone.now().replace(microsecond=0))
+                cursor.execute(
+                    f'INSERT INTO {table} (cache_key, value, expires) '
+                    f'VALUES {placeholders} ON CONFLICT (cache_key) '
+                    'DO UPDATE SET value = excluded.value, '
+                    'expires = excluded.expires',
+                    params)
+        except DatabaseError:
+            # Как и в штатном бэкенде, неудачная запись не ошибка.
+            return False
+        return True
+
+    def _expires(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            expires = datetime.max
+        elif settings.USE_TZ:
+            expires = datetime.utcfromtimestamp(timeout)
+        else:
+            expires = datetime.fromtimestamp(timeout)
+        return expires.replace(microsecond=0)
@@ -1,7 +1,9 @@
-from posts.models import Group
+from django.utils.functional import SimpleLazyObject
+
+from posts.cache import cached_group_list
 
 
 def group_list(request):
     return {
-        'group_list': Group.objects.all()
+        'group_list': SimpleLazyObject(cached_group_list)
     }
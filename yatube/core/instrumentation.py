@@ -0,0 +1,194 @@
+import random
+import threading
+import time
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connections
+from django.template.base import Template
+
+STATS_KEY = 'instrumentation:stats'
+UNRESOLVED = '<unresolved>'
+METRICS = ('queries', 'db_ms', 'render_ms', 'cache_hits', 'cache_misses',
+           'total_ms')
+
+_local = threading.local()
+_missing = object()
+
+
+class Probe:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.render_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.total_ms = 0.0
+        # Вложенные вызовы (include в шаблоне, get через get_many)
+        # учитываются один раз, во внешнем вызове.
+        self.render_depth = 0
+        self.cache_depth = 0
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db_ms:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.render_ms:.1f}',
+            f'cache;desc="{self.cache_hits} hits, '
+            f'{self.cache_misses} misses"',
+            f'total;dur={self.total_ms:.1f}',
+        ])
+
+
+def current_probe():
+    return getattr(_local, 'probe', None)
+
+
+def _elapsed_ms(start):
+    return (time.perf_counter() - start) * 1000
+
+
+def _count_query(execute, sql, params, many, context):
+    probe = current_probe()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if probe is not None:
+            probe.queries += 1
+            probe.db_ms += _elapsed_ms(start)
+
+
+def _install_template_probe():
+    if getattr(Template.render, 'instrumented', False):
+        return
+    render = Template.render
+
+    @wraps(render)
+    def timed_render(self, context):
+        probe = current_probe()
+        if probe is None:
+            return render(self, context)
+        probe.render_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            probe.render_depth -= 1
+            if not probe.render_depth:
+                probe.render_ms += _elapsed_ms(start)
+
+    timed_render.instrumented = True
+    Template.render = timed_render
+
+
+def _cache_call(method, count):
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        probe = current_probe()
+        if probe is None or probe.cache_depth:
+            return method(*args, **kwargs)
+        probe.cache_depth += 1
+        try:
+            return count(probe, *args, **kwargs)
+        finally:
+            probe.cache_depth -= 1
+    return wrapper
+
+
+def _install_cache_probe(backend):
+    """Оборачивает get и get_many экземпляра кэша текущего потока."""
+    if getattr(backend, 'instrumented', False):
+        return
+    get, get_many = backend.get, backend.get_many
+
+    def count_get(probe, key, default=None, version=None):
+        value = get(key, _missing, version)
+        if value is _missing:
+            probe.cache_misses += 1
+            return default
+        probe.cache_hits += 1
+        return value
+
+    def count_get_many(probe, keys, version=None):
+        keys = list(keys)
+        values = get_many(keys, version)
+        probe.cache_hits += len(values)
+        probe.cache_misses += len(keys) - len(values)
+        return values
+
+    backend.get = _cache_call(get, count_get)
+    backend.get_many = _cache_call(get_many, count_get_many)
+    backend.instrumented = True
+
+
+def record(view_name, probe):
+    """Добавляет замеры запроса в общие для всех воркеров итоги.
+
+    Запись идет без блокировки: при выборочном замере потеря редкого
+    одновременного обновления на итоги почти не влияет.
+    """
+    stats = cache.get(STATS_KEY) or {}
+    view = stats.setdefault(
+        view_name, dict.fromkeys(('requests', 'max_total_ms', *METRICS), 0))
+    view['requests'] += 1
+    for metric in METRICS:
+        view[metric] += getattr(probe, metric)
+    view['max_total_ms'] = max(view['max_total_ms'], probe.total_ms)
+    cache.set(STATS_KEY, stats, None)
+
+
+def summary():
+    """Средние значения по представлениям для страницы статистики."""
+    result = {}
+    for view_name, view in sorted((cache.get(STATS_KEY) or {}).items()):
+        requests = view['requests']
+        lookups = view['cache_hits'] + view['cache_misses']
+        result[view_name] = {
+            'requests': requests,
+            **{
+                f'avg_{metric}': round(view[metric] / requests, 2)
+                for metric in METRICS
+            },
+            'max_total_ms': round(view['max_total_ms'], 2),
+            'cache_hit_ratio': (
+                round(view['cache_hits'] / lookups, 3) if lookups else None
+            ),
+        }
+    return result
+
+
+class InstrumentationMiddleware:
+    """Замеряет запросы к базе, рендер шаблонов, кэш и общее время.
+
+    Замеряется доля INSTRUMENTATION_SAMPLE_RATE запросов: остальные
+    проходят без оберток. Замеренный ответ получает заголовок
+    Server-Timing, а итоги копятся по имени представления.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _install_template_probe()
+
+    def __call__(self, request):
+        if random.random() >= settings.INSTRUMENTATION_SAMPLE_RATE:
+            return self.get_response(request)
+        _install_cache_probe(caches['default'])
+        probe = _local.probe = Probe()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(_count_query))
+                response = self.get_response(request)
+        finally:
+            _local.probe = None
+        probe.total_ms = _elapsed_ms(start)
+        response['Server-Timing'] = probe.server_timing()
+        match = request.resolver_match
+        record(match.view_name if match else UNRESOLVED, probe)
+        return response
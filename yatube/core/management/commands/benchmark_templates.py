@@ -0,0 +1,86 @@
+import re
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+
+from core.warmup import template_names
+
+LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+EXTENDS_BASE = re.compile(r'{%\s*extends\s+["\']base\.html["\']\s*%}')
+
+
+def make_engine(cached):
+    params = settings.TEMPLATES[0]
+    options = {
+        name: value for name, value in params['OPTIONS'].items()
+        if name != 'loaders'
+    }
+    options['loaders'] = (
+        [('django.template.loaders.cached.Loader', LOADERS)]
+        if cached else LOADERS
+    )
+    return DjangoTemplates({
+        'NAME': 'cached' if cached else 'uncached',
+        'DIRS': params['DIRS'],
+        'APP_DIRS': False,
+        'OPTIONS': options,
+    })
+
+
+def base_pages():
+    for name in template_names():
+        for directory in settings.TEMPLATES[0]['DIRS']:
+            try:
+                with open(f'{directory}/{name}', encoding='utf-8') as file:
+                    source = file.read()
+            except FileNotFoundError:
+                continue
+            if EXTENDS_BASE.search(source):
+                yield name
+            break
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время рендера страниц на base.html '
+        'без кэша шаблонов и с cached.Loader'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def render_time(self, engine, name, request, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            engine.get_template(name).render({}, request)
+        return (time.perf_counter() - start) / iterations * 1000
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        uncached = make_engine(cached=False)
+        cached = make_engine(cached=True)
+        self.stdout.write(
+            f'{"Шаблон":<36}{"без кэша, мс":>14}{"с кэшем, мс":>14}'
+            f'{"ускорение":>11}'
+        )
+        for name in base_pages():
+            try:
+                cached.get_template(name).render({}, request)
+            except Exception as error:
+                self.stdout.write(f'{name:<36}пропущен: {error!r}')
+                continue
+            before = self.render_time(uncached, name, request, iterations)
+            after = self.render_time(cached, name, request, iterations)
+            self.stdout.write(
+                f'{name:<36}{before:>14.3f}{after:>14.3f}'
+                f'{before / after:>10.1f}x'
+            )
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    call_command(
+        'createcachetable',
+        database=schema_editor.connection.alias,
+        verbosity=0,
+    )
+
+
+def drop_cache_table(apps, schema_editor):
+    for cache in settings.CACHES.values():
+        if cache['BACKEND'].endswith('DatabaseCache'):
+            schema_editor.execute(
+                'DROP TABLE IF EXISTS '
+                + schema_editor.quote_name(cache['LOCATION'])
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = []
+
+    operations = [
+        migrations.RunPython(create_cache_table, drop_cache_table),
+    ]
@@ -0,0 +1,31 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+
+class DatabaseCacheTests(TestCase):
+    def tearDown(self):
+        cache.clear()
+
+    def test_set_many_single_write(self):
+        """Пачка ключей пишется одним запросом и заменяет старые значения."""
+
+        cache.set('card:1', 'старая')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(cache.set_many(
+                {f'card:{i}': f'карточка {i}' for i in range(1, 21)}), [])
+        sql = [
+            query['sql'] for query in queries.captured_queries
+            if 'SAVEPOINT' not in query['sql']
+        ]
+        self.assertEqual(len(sql), 2)
+        self.assertTrue(sql[1].startswith('INSERT'))
+        self.assertEqual(cache.get('card:1'), 'карточка 1')
+        self.assertEqual(cache.get('card:20'), 'карточка 20')
+
+    def test_set_many_respects_timeout(self):
+        cache.set_many({'card:1': 'карточка'}, timeout=-1)
+        self.assertIsNone(cache.get('card:1'))
+        cache.set_many({'card:1': 'карточка'}, timeout=None)
+        self.assertEqual(cache.get('card:1'), 'карточка')
@@ -0,0 +1,54 @@
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+
+from posts.models import Group
+from .context_processors.group_list import group_list
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class GroupListContextProcessorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.request = RequestFactory().get('/')
+        Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_group_list_is_lazy(self):
+        """Без обращения к списку групп запросов к базе нет."""
+
+        with self.assertNumQueries(0):
+            group_list(self.request)
+
+    def test_group_list_cached_between_requests(self):
+        """Список групп читается из базы один раз."""
+
+        with self.assertNumQueries(1):
+            self.assertEqual(len(group_list(self.request)['group_list']), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(group_list(self.request)['group_list']), 1)
+
+    def test_group_list_invalidated_on_change(self):
+        """Изменение групп сбрасывает кэш списка."""
+
+        list(group_list(self.request)['group_list'])
+        group = Group.objects.create(
+            title='Новая группа',
+            slug='new_slug',
+            description='Тестовое описание',
+        )
+        self.assertIn(group, list(group_list(self.request)['group_list']))
+        group.delete()
+        self.assertNotIn(group, list(group_list(self.request)['group_list']))
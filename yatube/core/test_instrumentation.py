@@ -0,0 +1,75 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .instrumentation import STATS_KEY, Probe, _install_cache_probe
+
+User = get_user_model()
+
+INDEX_URL = reverse('posts:main_page')
+STATS_URL = reverse('instrumentation_stats')
+
+
+@override_settings(INSTRUMENTATION_SAMPLE_RATE=1)
+class InstrumentationMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.user = User.objects.create_user(username='user')
+
+    def setUp(self):
+        cache.clear()
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def test_server_timing_header(self):
+        """Замеренный ответ содержит метрики в Server-Timing."""
+        timing = self.client.get(INDEX_URL)['Server-Timing']
+        for metric in ('db;dur=', 'queries', 'tpl;dur=', 'cache;desc=',
+                       'total;dur='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, timing)
+
+    def test_stats_by_view_name(self):
+        """Итоги копятся по имени представления."""
+        self.client.get(INDEX_URL)
+        self.client.get(INDEX_URL)
+        stats = self.staff_client.get(STATS_URL).json()['views']
+        index = stats['posts:main_page']
+        self.assertEqual(index['requests'], 2)
+        self.assertGreater(index['avg_queries'], 0)
+        self.assertGreater(index['avg_total_ms'], 0)
+        # Вторая страница отдается из кэша ленты.
+        self.assertGreater(index['cache_hit_ratio'], 0)
+
+    def test_stats_endpoint_staff_only(self):
+        """Статистика доступна только сотрудникам."""
+        client = Client()
+        client.force_login(self.user)
+        self.assertEqual(client.get(STATS_URL).status_code, 302)
+        self.assertEqual(self.staff_client.get(STATS_URL).status_code, 200)
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=0)
+    def test_unsampled_request_untouched(self):
+        """Незамеренный запрос проходит без заголовка и итогов."""
+        response = self.client.get(INDEX_URL)
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertIsNone(cache.get(STATS_KEY))
+
+    def test_cache_probe_counts_nested_calls_once(self):
+        """get_many, реализованный через get, считается одним обращением."""
+        backend = LocMemCache('instrumentation-test', {})
+        backend.set('a', 1)
+        _install_cache_probe(backend)
+        probe = Probe()
+        with mock.patch('core.instrumentation._local') as local:
+            local.probe = probe
+            backend.get('a')
+            backend.get('b')
+            backend.get_many(['a', 'b'])
+        self.assertEqual((probe.cache_hits, probe.cache_misses), (2, 2))
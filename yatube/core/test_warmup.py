@@ -0,0 +1,24 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from .warmup import template_names, warm_templates
+
+
+class TemplatesWarmupTests(TestCase):
+    def test_all_templates_compiled(self):
+        """Прогрев компилирует все шаблоны проекта."""
+
+        names = list(template_names())
+        self.assertIn('base.html', names)
+        self.assertIn('posts/index.html', names)
+        self.assertEqual(warm_templates(), len(names))
+
+    def test_benchmark_templates_command(self):
+        """Бенчмарк шаблонов печатает время для страниц на base.html."""
+
+        out = StringIO()
+        call_command('benchmark_templates', iterations=1, stdout=out)
+        self.assertIn('posts/index.html', out.getvalue())
+        self.assertNotIn('base.html ', out.getvalue())
@@ -0,0 +1,24 @@
+import os
+
+from django.conf import settings
+from django.template import engines
+
+
+def template_names():
+    """Имена всех шаблонов из каталогов TEMPLATES['DIRS']."""
+    for directory in settings.TEMPLATES[0]['DIRS']:
+        for root, _, files in os.walk(directory):
+            for filename in sorted(files):
+                if filename.endswith('.html'):
+                    yield os.path.relpath(
+                        os.path.join(root, filename), directory
+                    ).replace(os.sep, '/')
+
+
+def warm_templates():
+    """Компилирует шаблоны заранее, возвращает их число."""
+    engine = engines['django']
+    names = list(template_names())
+    for name in names:
+        engine.get_template(name)
+    return len(names)
@@ -1,15 +1,25 @@
 from django.contrib import admin
 
+from . import search
+from .forms import PostAdminForm
 from .models import Post, Group, Comment, Follow
 
 
 class PostAdmin(admin.ModelAdmin):
+    form = PostAdminForm
     list_display = ('pk', 'text', 'pub_date', 'author', 'group',)
     list_editable = ('group',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по полнотекстовому индексу вместо LIKE '%...%' по text.
+        if not search_term:
+            return queryset, False
+        return search.matching(
+            search_term, queryset, columns=['text']), False
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
@@ -0,0 +1,143 @@
+from urllib.parse import urlencode
+
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+
+from . import freshness, timeline
+from .models import Comment, Group, Post, User
+from .paginators import KeysetPaginator
+from yatube.settings import POSTS_IN_PAGE
+
+
+def post_data(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': post.image.url if post.image else None,
+    }
+
+
+def comment_data(comment):
+    return {
+        'id': comment.pk,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    }
+
+
+def page_link(request, cursor):
+    if cursor is None:
+        return None
+    return request.build_absolute_uri(
+        f'{request.path}?{urlencode({"cursor": cursor})}')
+
+
+def feed_response(request, queryset, *key, feeds=None, make_paginator=None,
+                  **extra):
+    """Страница ленты по курсору или 304, если лента не менялась.
+
+    Состояние ленты считается до выборки постов, поэтому неизменившаяся
+    лента не читается и не сериализуется. Для лент с версиями в кэше
+    (feeds) это дата последнего поста по индексу, а правки и удаления
+    учитывают версии; без queryset свежесть задают только версии.
+    make_paginator строит пагинатор вместо постраничного вывода
+    queryset по дате и вызывается только для ответа со страницей.
+    """
+    if feeds is None:
+        last_modified, count = freshness.feed_state(queryset)
+        parts = [last_modified, count]
+    elif queryset is None:
+        last_modified = None
+        parts = []
+    else:
+        last_modified = freshness.last_published(queryset)
+        parts = [last_modified]
+    etag = freshness.make_etag(
+        *key, request.get_full_path(), *parts, feeds=feeds or ())
+
+    def respond():
+        paginator = (
+            make_paginator() if make_paginator
+            else KeysetPaginator(queryset.for_feed(), POSTS_IN_PAGE)
+        )
+        page = paginator.get_page(request.GET.get('cursor'))
+        return JsonResponse({
+            **extra,
+            'results': [post_data(post) for post in page],
+            'next': page_link(request, page.next_cursor),
+            'previous': page_link(request, page.previous_cursor),
+        }, json_dumps_params={'ensure_ascii': False})
+
+    return freshness.conditional(request, etag, last_modified, respond)
+
+
+@require_safe
+def index(request):
+    return feed_response(
+        request, Post.objects.all(), 'index', feeds=['index'])
+
+
+@require_safe
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(
+        request, group.posts.all(), 'group', group.pk,
+        feeds=[f'group:{group.slug}'],
+        group={
+            'slug': group.slug,
+            'title': group.title,
+            'description': group.description,
+        },
+    )
+
+
+@require_safe
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_response(
+        request, author.posts.all(), 'author', author.pk,
+        feeds=[f'author:{author.username}'],
+        author={
+            'username': author.username,
+            'full_name': author.get_full_name(),
+        },
+    )
+
+
+@require_safe
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return JsonResponse(
+            {'detail': 'Требуется вход на сайт'}, status=401)
+    user = request.user
+    return feed_response(
+        request, None, 'follow', user.pk,
+        feeds=timeline.freshness_feeds(user),
+        make_paginator=lambda: timeline.paginator(user, POSTS_IN_PAGE),
+    )
+
+
+@require_safe
+def post_detail(request, post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), id=post_id)
+    comments = Comment.objects.filter(post=post)
+    commented, count = freshness.feed_state(comments, 'created')
+    last_modified = max(filter(None, [post.updated, commented]))
+    etag = freshness.make_etag('post', post.pk, post.updated, commented, count)
+
+    def respond():
+        return JsonResponse({
+            'post': post_data(post),
+            'comments': [
+                comment_data(comment)
+                for comment in comments.select_related('author')
+            ],
+        }, json_dumps_params={'ensure_ascii': False})
+
+    return freshness.conditional(request, etag, last_modified, respond)
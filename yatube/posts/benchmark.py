@@ -0,0 +1,139 @@
+import math
+import random
+import time
+
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from .models import Group, Post, User
+from .seed import _text
+
+ENDPOINTS = (
+    'index',
+    'group_posts',
+    'profile',
+    'post_detail',
+    'follow_index',
+    'post_create',
+    'add_comment',
+)
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, percent):
+    """Процентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = math.ceil(percent / 100 * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+
+class Targets:
+    """Случайные, но воспроизводимые по random_seed адреса запросов."""
+
+    def __init__(self, random_seed):
+        self.rnd = random.Random(random_seed)
+        self.slugs = list(Group.objects.values_list('slug', flat=True))
+        self.usernames = list(User.objects.values_list('username', flat=True))
+        self.post_ids = list(Post.objects.values_list('pk', flat=True))
+        self.group_ids = list(Group.objects.values_list('pk', flat=True))
+
+    def index(self):
+        return 'get', reverse('posts:main_page'), None
+
+    def group_posts(self):
+        slug = self.rnd.choice(self.slugs)
+        return 'get', reverse('posts:group_posts', args=[slug]), None
+
+    def profile(self):
+        username = self.rnd.choice(self.usernames)
+        return 'get', reverse('posts:profile', args=[username]), None
+
+    def post_detail(self):
+        post_id = self.rnd.choice(self.post_ids)
+        return 'get', reverse('posts:post_detail', args=[post_id]), None
+
+    def follow_index(self):
+        return 'get', reverse('posts:follow_index'), None
+
+    def post_create(self):
+        return 'post', reverse('posts:post_create'), {
+            'text': _text(self.rnd, self.rnd.randint(5, 60)),
+            'group': self.rnd.choice(self.group_ids + ['']),
+        }
+
+    def add_comment(self):
+        post_id = self.rnd.choice(self.post_ids)
+        return 'post', reverse('posts:add_comment', args=[post_id]), {
+            'text': _text(self.rnd, self.rnd.randint(3, 20)),
+        }
+
+
+def reader():
+    """Автор с самым большим числом подписок: его лента не пуста."""
+    return User.objects.annotate(
+        total=Count('follower')).order_by('-total', 'pk').first()
+
+
+def measure(client, request):
+    method, url, data = request
+    queries = 0
+
+    def count_query(execute, *args):
+        nonlocal queries
+        queries += 1
+        return execute(*args)
+
+    with connection.execute_wrapper(count_query):
+        start = time.perf_counter()
+        response = getattr(client, method)(url, data)
+        elapsed = time.perf_counter() - start
+    return elapsed, queries, response.status_code
+
+
+def run(endpoints=ENDPOINTS, requests=200, warmup=20, random_seed=0):
+    """Прогоняет запросы через полный цикл обработки Django.
+
+    Запросы идут по очереди, каждое представление отдельно; анонимные
+    страницы читает гость, остальные - вошедший пользователь. Выборочные
+    замеры InstrumentationMiddleware выключены, чтобы число запросов
+    к базе не зависело от случая.
+    """
+    targets = Targets(random_seed)
+    guest = Client()
+    user = Client()
+    user.force_login(reader())
+    clients = {
+        'follow_index': user,
+        'post_create': user,
+        'add_comment': user,
+    }
+    results = {}
+    with override_settings(INSTRUMENTATION_SAMPLE_RATE=0):
+        for name in endpoints:
+            client = clients.get(name, guest)
+            make_request = getattr(targets, name)
+            for _ in range(warmup):
+                measure(client, make_request())
+            samples = [
+                measure(client, make_request()) for _ in range(requests)
+            ]
+            results[name] = summarize(samples)
+    return results
+
+
+def summarize(samples):
+    timings = [elapsed * 1000 for elapsed, _, _ in samples]
+    total = sum(elapsed for elapsed, _, _ in samples)
+    return {
+        'requests': len(samples),
+        'errors': sum(status >= 400 for _, _, status in samples),
+        **{
+            f'p{percent}_ms': round(percentile(timings, percent), 3)
+            for percent in PERCENTILES
+        },
+        'requests_per_second': round(len(samples) / total, 1),
+        'queries_per_request': round(
+            sum(queries for _, queries, _ in samples) / len(samples), 2),
+    }
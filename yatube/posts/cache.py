@@ -0,0 +1,140 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Group
+
+GROUP_LIST_KEY = 'group_list'
+VERSION_KEY = 'feed_version:{}'
+# Версия, общая для всех страниц: сбрасывается редкими изменениями,
+# которые видны во всех лентах сразу (переименование группы или автора).
+SITE_FEED = 'site'
+PAGE_KEY = 'feed_page:{}'
+LOCK_KEY = '{}:lock'
+
+
+def _new_version():
+    # Версия после вытеснения ключа не должна повторять старые,
+    # поэтому начальное значение берется от текущего времени.
+    return int(time.time() * 1000)
+
+
+def feed_versions(feeds):
+    keys = {feed: VERSION_KEY.format(feed) for feed in feeds}
+    stored = cache.get_many(keys.values())
+    versions = {}
+    for feed, key in keys.items():
+        if key not in stored:
+            cache.add(key, _new_version(), None)
+            stored[key] = cache.get(key)
+        versions[feed] = stored[key]
+    return versions
+
+
+def _bump_versions(feeds):
+    keys = [VERSION_KEY.format(feed) for feed in feeds]
+    stored = cache.get_many(keys)
+    version = _new_version()
+    cache.set_many({
+        key: max(version, stored.get(key, 0) + 1) for key in keys
+    }, None)
+
+
+def invalidate_feeds(*feeds):
+    """Сбрасывает ленты сразу и повторно после фиксации транзакции.
+
+    Повторный сброс не дает закэшировать страницу, собранную параллельным
+    запросом по еще не зафиксированным данным. Версии всех лент читаются
+    и пишутся пачкой: лент подписок у поста бывает до тысячи.
+    """
+    if not feeds:
+        return
+
+    def invalidate():
+        _bump_versions(feeds)
+
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+def cached_group_list():
+    groups = cache.get(GROUP_LIST_KEY)
+    if groups is None:
+        groups = list(Group.objects.all())
+        cache.set(GROUP_LIST_KEY, groups, None)
+    return groups
+
+
+def invalidate_group_list():
+    cache.delete(GROUP_LIST_KEY)
+    transaction.on_commit(lambda: cache.delete(GROUP_LIST_KEY))
+
+
+def page_keys(request, feeds):
+    """Ключи страницы: текущей версии и последней собранной версии."""
+    versions = feed_versions(feeds)
+    base = hashlib.md5('|'.join([
+        *feeds, str(request.user.pk), request.get_full_path()
+    ]).encode()).hexdigest()
+    version = hashlib.md5('|'.join(
+        str(versions[feed]) for feed in feeds
+    ).encode()).hexdigest()
+    return PAGE_KEY.format(f'{base}:{version}'), PAGE_KEY.format(base)
+
+
+def cacheable(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+    )
+
+
+def cache_feed(*feeds):
+    """Кэширует страницу ленты до изменения данных.
+
+    Ключ страницы содержит версии перечисленных лент; шаблоны имен
+    заполняются аргументами представления, например ``'group:{slug}'``.
+    Сигналы моделей увеличивают версии, и старые страницы перестают
+    находиться, поэтому срок жизни записи задает FEED_CACHE_TIMEOUT,
+    а не свежесть данных.
+
+    Устаревшую страницу пересобирает только запрос, взявший блокировку;
+    остальные в это время получают последнюю собранную версию.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            key, stale_key = page_keys(request, [
+                SITE_FEED, *(feed.format(**kwargs) for feed in feeds)
+            ])
+            response = cache.get(key)
+            if response is not None:
+                return response
+            lock_key = LOCK_KEY.format(key)
+            if not cache.add(lock_key, True, settings.FEED_CACHE_LOCK_TIMEOUT):
+                response = cache.get(stale_key)
+                if response is not None:
+                    # Валидаторы текущего состояния к этой копии не
+                    # подходят; page_condition их не выставит.
+                    response.stale = True
+                    return response
+                return view(request, *args, **kwargs)
+            try:
+                response = view(request, *args, **kwargs)
+                if cacheable(response):
+                    cache.set(key, response, settings.FEED_CACHE_TIMEOUT)
+                    # Последняя версия живет дольше текущей, чтобы было
+                    # что отдать и после истечения срока жизни.
+                    cache.set(stale_key, response, None)
+            finally:
+                cache.delete(lock_key)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,131 @@
+import csv
+import datetime
+import json
+import zlib
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Comment, Follow, Post
+
+CHUNK_SIZE = 2000
+# Сжатые данные отдаются кусками не меньше этого размера.
+FLUSH_SIZE = 64 * 1024
+FORMATS = ('jsonl', 'csv')
+
+# Поля совпадают с входными полями import_content.
+EXPORTS = {
+    'posts': (
+        Post,
+        'pub_date',
+        {
+            'id': 'pk',
+            'author': 'author__username',
+            'group': 'group__slug',
+            'text': 'text',
+            'pub_date': 'pub_date',
+            'image': 'image',
+        },
+    ),
+    'comments': (
+        Comment,
+        'created',
+        {
+            'id': 'pk',
+            'post': 'post_id',
+            'author': 'author__username',
+            'text': 'text',
+            'created': 'created',
+        },
+    ),
+    # У подписок нет даты, они выгружаются целиком.
+    'follows': (
+        Follow,
+        None,
+        {
+            'user': 'user__username',
+            'author': 'author__username',
+        },
+    ),
+}
+
+
+def parse_since(value):
+    """Дата и время или просто дата в ISO 8601; ValueError, если ни то."""
+    since = parse_datetime(value)
+    if since is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f'Неверная дата: {value!r}')
+        since = datetime.datetime.combine(date, datetime.time())
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def rows(kind, since=None):
+    """Строки выгрузки по порядку ключа, без загрузки всей таблицы."""
+    model, date_field, fields = EXPORTS[kind]
+    queryset = model.objects.order_by('pk')
+    if since is not None and date_field:
+        queryset = queryset.filter(**{f'{date_field}__gte': since})
+    names = list(fields)
+    values = queryset.values_list(*fields.values())
+    for row in values.iterator(chunk_size=CHUNK_SIZE):
+        yield dict(zip(names, row))
+
+
+def _value(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+class _Echo:
+    """Файл для csv.writer, который возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def encode(kind, rows, output_format):
+    if output_format == 'csv':
+        writer = csv.writer(_Echo())
+        fields = list(EXPORTS[kind][2])
+        yield writer.writerow(fields)
+        for row in rows:
+            yield writer.writerow(
+                ['' if row[name] is None else _value(row[name])
+                 for name in fields])
+    else:
+        for row in rows:
+            yield json.dumps(
+                {name: _value(value) for name, value in row.items()},
+                ensure_ascii=False,
+            ) + '\n'
+
+
+def gzipped(chunks):
+    """Сжимает поток строк в gzip, не держа в памяти весь файл."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    pending = []
+    size = 0
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            pending.append(data)
+            size += len(data)
+        if size >= FLUSH_SIZE:
+            yield b''.join(pending)
+            pending, size = [], 0
+    pending.append(compressor.flush())
+    yield b''.join(pending)
+
+
+def export(kind, output_format='jsonl', since=None):
+    """Сжатая выгрузка одного вида данных кусками байтов."""
+    return gzipped(encode(kind, rows(kind, since), output_format))
+
+
+def filename(kind, output_format):
+    return f'{kind}.{output_format}.gz'
@@ -1,14 +1,62 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
 
+from . import uploads
 from .models import Post, Comment
 
 
-class PostForm(forms.ModelForm):
+class UploadLimitsMixin:
+    """Отклоняет файлы больше IMAGE_UPLOAD_MAX_BYTES в любой форме поста.
+
+    Обработчик загрузки сохранил только начало такого файла, поэтому
+    файл убирается из формы до разбора, а поле получает ошибку размера,
+    а не «файл поврежден».
+    """
+
+    TOO_LARGE = 'Файл больше {limit}.'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.too_large = [
+            name for name, upload in self.files.items()
+            if name in self.fields and uploads.is_too_large(upload)
+        ]
+        if self.too_large:
+            self.files = self.files.copy()
+            for name in self.too_large:
+                del self.files[name]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for name in self.too_large:
+            self.add_error(name, self.TOO_LARGE.format(
+                limit=filesizeformat(settings.IMAGE_UPLOAD_MAX_BYTES)))
+        return cleaned_data
+
+
+class PostForm(UploadLimitsMixin, forms.ModelForm):
+
+    TOO_MANY_PIXELS = 'Картинка больше {limit} мегапикселей.'
 
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if not isinstance(image, UploadedFile):
+            return image
+        if uploads.has_too_many_pixels(image.image):
+            raise forms.ValidationError(self.TOO_MANY_PIXELS.format(
+                limit=settings.IMAGE_UPLOAD_MAX_PIXELS // 10 ** 6))
+        return uploads.downscale(image)
+
+
+class PostAdminForm(UploadLimitsMixin, forms.ModelForm):
+    pass
+
 
 class CommentForm(forms.ModelForm):
 
@@ -0,0 +1,123 @@
+import calendar
+import hashlib
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+
+from .cache import SITE_FEED, feed_versions
+
+
+def feed_state(queryset, field='updated'):
+    """Время последнего изменения и число строк одним запросом.
+
+    По умолчанию берется updated, а не pub_date: он меняется и при
+    правке поста. Удаление видно по изменившемуся числу строк.
+    """
+    state = queryset.order_by().aggregate(
+        last_modified=Max(field), count=Count('pk'))
+    return state['last_modified'], state['count']
+
+
+def last_published(queryset):
+    """Дата самого нового поста.
+
+    Ее отдают индексы лент по pub_date без чтения постов. Правки
+    и удаления дату не сдвигают: их учитывают версии лент в ETag.
+    """
+    return queryset.order_by().aggregate(
+        last_published=Max('pub_date'))['last_published']
+
+
+def make_etag(*parts, feeds=()):
+    """ETag из частей состояния и версий лент из кэша.
+
+    Версия сайта добавляется всегда: она меняется при переименовании
+    групп и авторов, а эти данные есть в ответе, но не в состоянии
+    самих постов.
+    """
+    versions = feed_versions([SITE_FEED, *feeds])
+    parts += tuple(versions[feed] for feed in [SITE_FEED, *feeds])
+    return hashlib.md5(
+        '|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def conditional(request, etag, last_modified, respond):
+    """Отвечает 304 по валидаторам, не вызывая respond().
+
+    То же, что django.views.decorators.http.condition, но валидаторы
+    считаются один раз и заранее, а не двумя отдельными функциями.
+    """
+    etag = quote_etag(etag)
+    timestamp = (
+        calendar.timegm(last_modified.utctimetuple())
+        if last_modified else None
+    )
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = respond()
+    if request.method in ('GET', 'HEAD'):
+        if not response.has_header('ETag'):
+            response['ETag'] = etag
+        if timestamp and not response.has_header('Last-Modified'):
+            response['Last-Modified'] = http_date(timestamp)
+        # Клиент хранит ответ, но каждый раз сверяет его по валидаторам.
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+def page_condition(state):
+    """condition() для HTML-страницы по функции состояния.
+
+    state(request, **kwargs) не больше чем одним запросом возвращает
+    ``(last_modified, parts, feeds)`` или None, если объекта нет;
+    last_modified равно None, если дата не отражает всех изменений.
+    Результат запоминается на запросе, чтобы функции ETag и
+    Last-Modified не читали базу дважды. В ETag входят пользователь
+    и адрес: страница для каждого своя (меню, подписка, форма).
+    Версии лент из feeds меняются вместе с данными, которые на
+    странице есть, а в состоянии нет: правки, счетчики автора,
+    миниатюры.
+
+    Устаревшая копия из cache_feed (``response.stale``) уходит без
+    ETag и Last-Modified: иначе клиент получил бы 304 на нее и после
+    пересборки страницы. Как и в conditional(), браузер не считает
+    страницу свежей сам, а сверяет ее каждый раз; страница личная
+    и в общих кэшах не хранится.
+    """
+    def page_state(request, *args, **kwargs):
+        if not hasattr(request, 'page_state'):
+            request.page_state = state(request, *args, **kwargs)
+        return request.page_state
+
+    def etag(request, *args, **kwargs):
+        current = page_state(request, *args, **kwargs)
+        if current is None:
+            return None
+        last_modified, parts, feeds = current
+        return make_etag(
+            request.user.pk, request.get_full_path(), last_modified,
+            *parts, feeds=feeds)
+
+    def last_modified(request, *args, **kwargs):
+        current = page_state(request, *args, **kwargs)
+        return current and current[0]
+
+    def decorator(view):
+        conditional_view = condition(
+            etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if getattr(response, 'stale', False):
+                del response['ETag']
+                del response['Last-Modified']
+            if request.method in ('GET', 'HEAD'):
+                patch_cache_control(response, no_cache=True, private=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,107 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+
+from posts import timeline
+from posts.models import Comment, Group, Post, User
+from posts.paginators import NEXT, KeysetPaginator
+from posts.seed import seed, temporary_database
+from yatube.settings import POSTS_IN_PAGE
+
+FULL_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет временную базу и проверяет по EXPLAIN QUERY PLAN, '
+        'что запросы лент идут по индексам без полной сортировки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument('--follows', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def feeds(self):
+        author = User.objects.annotate(
+            total=Count('posts')).order_by('-total').first()
+        group = Group.objects.annotate(
+            total=Count('posts')).order_by('-total').first()
+        post = Post.objects.annotate(
+            total=Count('comments')).order_by('-total').first()
+        follower = User.objects.annotate(
+            total=Count('timeline')
+        ).filter(total__gt=0).order_by('-total').first()
+        for name, queryset in [
+            ('index', Post.objects.for_feed()),
+            ('profile', author.posts.for_feed()),
+            ('group_posts', group.posts.for_feed()),
+        ]:
+            yield name, KeysetPaginator(queryset, POSTS_IN_PAGE)
+        if follower is not None:
+            yield 'follow_index', timeline.paginator(follower, POSTS_IN_PAGE)
+        yield 'post_detail comments', Comment.objects.filter(post=post)
+
+    def pages(self, feed):
+        """Первая и глубокая (середина ленты) страницы одной ленты.
+
+        У ленты подписок глубокая страница берется из середины ящика:
+        старше его границы лента дочитывается из подписок.
+        """
+        if not isinstance(feed, KeysetPaginator):
+            yield 'first', feed
+            return
+        yield 'first', feed.object_list[:POSTS_IN_PAGE + 1]
+        middle = feed.object_list[feed.object_list.count() // 2]
+        _, deep = feed.seek(feed.encode_cursor(middle, NEXT))
+        yield 'deep', deep[:POSTS_IN_PAGE + 1]
+
+    def timing(self, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            self.stdout.write('Наполнение базы...')
+            seed(
+                users=options['users'],
+                groups=options['groups'],
+                posts=options['posts'],
+                comments=options['comments'],
+                follows=options['follows'],
+                random_seed=options['seed'],
+            )
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            sorted_feeds = self.report(options['repeat'])
+        if sorted_feeds:
+            raise CommandError(
+                'Полная сортировка в лентах: ' + ', '.join(sorted_feeds))
+        self.stdout.write(self.style.SUCCESS('Все ленты читаются по индексам'))
+
+    def report(self, repeat):
+        sorted_feeds = []
+        for name, feed in self.feeds():
+            for page, queryset in self.pages(feed):
+                plan = queryset.explain()
+                full_sort = FULL_SORT in plan
+                if full_sort:
+                    sorted_feeds.append(f'{name} ({page})')
+                self.stdout.write(
+                    f'{name} ({page}): {self.timing(queryset, repeat):.2f} мс'
+                    f'{", ПОЛНАЯ СОРТИРОВКА" if full_sort else ""}'
+                )
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+        return sorted_feeds
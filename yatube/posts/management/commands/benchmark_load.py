@@ -0,0 +1,77 @@
+import json
+import platform
+import subprocess
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts import benchmark
+from posts.seed import seed, temporary_database
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет временную базу и замеряет задержки, запросы в секунду '
+        'и число запросов к базе у основных страниц; результат - JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--follows', type=int, default=2000)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--endpoint', action='append', choices=benchmark.ENDPOINTS,
+            dest='endpoints',
+            help='Замерить только это представление (можно повторять)')
+        parser.add_argument(
+            '--output', help='Записать JSON в файл, а не в stdout')
+
+    def handle(self, *args, **options):
+        scale = {
+            name: options[name]
+            for name in ('users', 'groups', 'posts', 'comments', 'follows')
+        }
+        with temporary_database():
+            self.stderr.write('Наполнение базы...')
+            seed(**scale, random_seed=options['seed'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            self.stderr.write('Замеры...')
+            results = benchmark.run(
+                endpoints=options['endpoints'] or benchmark.ENDPOINTS,
+                requests=options['requests'],
+                warmup=options['warmup'],
+                random_seed=options['seed'],
+            )
+        report = json.dumps({
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'scale': scale,
+            'requests': options['requests'],
+            'warmup': options['warmup'],
+            'seed': options['seed'],
+            'endpoints': results,
+        }, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(report + '\n')
+        else:
+            self.stdout.write(report)
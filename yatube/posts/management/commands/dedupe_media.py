@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import thumbnails
+from posts.models import MediaBlob, Post
+from posts.signals import delete_blob
+from posts.storage import content_storage, is_content_addressed
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов в хранилище по содержимому, '
+        'удаляет дубликаты и пересчитывает ссылки на файлы'
+    )
+
+    def handle(self, *args, **options):
+        renamed = {}
+        posts = Post.objects.exclude(image='').exclude(image=None)
+        for name in posts.values_list('image', flat=True).distinct():
+            if is_content_addressed(name) or not content_storage.exists(name):
+                continue
+            with content_storage.open(name) as content:
+                renamed[name] = content_storage.save(name, content)
+        with transaction.atomic():
+            for old, new in renamed.items():
+                Post.objects.filter(image=old).update(image=new)
+            blobs = MediaBlob.objects.rebuild()
+        for old, new in renamed.items():
+            if old != new:
+                delete_blob(old)
+        queued = thumbnails.schedule_missing()
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено файлов: {len(renamed)}, '
+            f'файлов в хранилище: {blobs}, '
+            f'поставлено на миниатюры: {queued}'
+        ))
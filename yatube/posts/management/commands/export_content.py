@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import exporter
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии или подписки в сжатый gzip '
+        'JSON Lines или CSV, при необходимости начиная с даты'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(exporter.EXPORTS))
+        parser.add_argument(
+            '--format', choices=exporter.FORMATS, default='jsonl')
+        parser.add_argument(
+            '--since', help='Только записи с этой даты (ISO 8601)')
+        parser.add_argument(
+            '--output',
+            help='Файл для записи; по умолчанию <kind>.<format>.gz, '
+                 '«-» - stdout')
+
+    def handle(self, *args, **options):
+        kind, output_format = options['kind'], options['format']
+        since = None
+        if options['since']:
+            try:
+                since = exporter.parse_since(options['since'])
+            except ValueError as error:
+                raise CommandError(error)
+        chunks = exporter.export(kind, output_format, since)
+        output = options['output'] or exporter.filename(kind, output_format)
+        if output == '-':
+            sys.stdout.buffer.writelines(chunks)
+            sys.stdout.buffer.flush()
+            return
+        with open(output, 'wb') as file:
+            file.writelines(chunks)
+        self.stdout.write(self.style.SUCCESS(f'Выгружено в {output}'))
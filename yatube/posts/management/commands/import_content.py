@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from posts.importer import BATCH_SIZE, Importer, read_rows
+
+KINDS = ('posts', 'comments', 'follows')
+
+
+class Command(BaseCommand):
+    help = (
+        'Массово загружает посты, комментарии и подписки из JSON Lines '
+        'или CSV, сохраняя исходные даты'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', metavar='FILE',
+            help='id, author, group, text, pub_date, image')
+        parser.add_argument(
+            '--comments', metavar='FILE',
+            help='post (id поста), author, text, created')
+        parser.add_argument('--follows', metavar='FILE', help='user, author')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if not any(options[kind] for kind in KINDS):
+            raise CommandError('Укажите хотя бы один из --posts, '
+                               '--comments, --follows')
+        importer = Importer(batch_size=options['batch_size'])
+        try:
+            for kind in KINDS:
+                if options[kind]:
+                    self.load(importer, kind, options[kind])
+        finally:
+            # Уже записанные пачки остаются в базе, даже если импорт
+            # прервался, и производные данные должны им соответствовать.
+            start = time.perf_counter()
+            queued = importer.finish()
+            self.stdout.write(
+                f'Счетчики, ленты подписок и кэш обновлены за '
+                f'{time.perf_counter() - start:.1f} с'
+            )
+        if queued:
+            self.stdout.write(f'Поставлено на миниатюры: {queued}')
+        self.stdout.write(self.style.SUCCESS('Импорт завершен'))
+
+    def load(self, importer, kind, path):
+        start = time.perf_counter()
+        try:
+            created = getattr(importer, kind)(read_rows(path))
+        except (OSError, ValueError, IntegrityError) as error:
+            raise CommandError(f'{kind}: {error}')
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'{kind}: {created} строк за {elapsed:.1f} с '
+            f'({created / elapsed if elapsed else 0:.0f} строк/с), '
+            f'пропущено {importer.skipped[kind]}'
+        )
+        if kind in importer.errors:
+            self.stdout.write(f'    первая ошибка: {importer.errors[kind]}')
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Применяет к поисковому индексу очередь измененных постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=search.BATCH_SIZE)
+        parser.add_argument(
+            '--interval', type=float, default=2,
+            help='Пауза в секундах, когда очередь пуста')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и завершиться')
+
+    def handle(self, *args, **options):
+        done = 0
+        while True:
+            processed = search.process(options['batch'])
+            done += processed
+            if processed:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Обработано постов: {done}'))
@@ -0,0 +1,50 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Создает миниатюры картинок постов из очереди в пуле потоков'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS)
+        parser.add_argument('--batch', type=int, default=100)
+        parser.add_argument(
+            '--interval', type=float, default=2,
+            help='Пауза в секундах, когда очередь пуста')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и завершиться')
+        parser.add_argument(
+            '--missing', action='store_true',
+            help='Сначала поставить в очередь посты без миниатюр')
+
+    def handle(self, *args, **options):
+        if options['missing']:
+            self.stdout.write(
+                f'Поставлено в очередь: {thumbnails.schedule_missing()}')
+        pool = None
+        if options['workers'] > 1:
+            pool = ThreadPoolExecutor(
+                max_workers=options['workers'],
+                thread_name_prefix='thumbnails',
+            )
+        done = 0
+        try:
+            while True:
+                processed = thumbnails.process(options['batch'], pool)
+                done += processed
+                if processed:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(f'Обработано постов: {done}'))
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Заново строит поисковый индекс постов пачками в пуле потоков'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.SEARCH_INDEX_WORKERS)
+        parser.add_argument(
+            '--chunk-size', type=int, default=search.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if not search.enabled():
+            raise CommandError('Поисковый индекс есть только в SQLite')
+        total = Post.objects.count()
+
+        def progress(done, rate):
+            self.stdout.write(
+                f'{done}/{total} постов ({rate:.0f} док/с)')
+
+        done = search.rebuild(
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {done}'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import UserStats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики постов, подписок и комментариев'
+
+    def handle(self, *args, **options):
+        total = UserStats.objects.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитана статистика: {total}')
+        )
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThumbnailTask',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='thumbnail_task', serialize=False, to='posts.Post', verbose_name='Пост')),
+                ('queued', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Поставлена в очередь')),
+            ],
+            options={
+                'verbose_name': 'Задача на миниатюры',
+                'verbose_name_plural': 'Задачи на миниатюры',
+            },
+        ),
+    ]
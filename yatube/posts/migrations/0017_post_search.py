@@ -0,0 +1,52 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+import posts.models
+
+CREATE_INDEX = '''
+    CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+        text, tokenize = "unicode61 remove_diacritics 2"
+    )
+'''
+FILL_INDEX = '''
+    INSERT INTO posts_post_fts(rowid, text)
+    SELECT id, replace(replace(text, 'ё', 'е'), 'Ё', 'Е') FROM posts_post
+'''
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_INDEX)
+    schema_editor.execute(FILL_INDEX)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE posts_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_media_blob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearch',
+            fields=[
+                ('post', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='posts.Post', verbose_name='Пост')),
+                ('text', posts.models.FullTextField(verbose_name='Текст')),
+            ],
+            options={
+                'verbose_name': 'Поисковый индекс поста',
+                'verbose_name_plural': 'Поисковый индекс постов',
+                'db_table': 'posts_post_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
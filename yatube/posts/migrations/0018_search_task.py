@@ -0,0 +1,67 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:22
+
+from django.db import migrations, models
+import django.utils.timezone
+
+# Документ поста - его текст и тексты комментариев отдельной колонкой.
+CREATE_INDEX = '''
+    CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+        text, comments, tokenize = "unicode61 remove_diacritics 2"
+    )
+'''
+FILL_INDEX = '''
+    INSERT INTO posts_post_fts(rowid, text, comments)
+    SELECT
+        posts_post.id,
+        replace(replace(posts_post.text, 'ё', 'е'), 'Ё', 'Е'),
+        replace(replace(
+            coalesce(group_concat(posts_comment.text, ' '), ''),
+            'ё', 'е'), 'Ё', 'Е')
+    FROM posts_post
+    LEFT JOIN posts_comment ON posts_comment.post_id = posts_post.id
+    GROUP BY posts_post.id
+'''
+CREATE_POST_INDEX = '''
+    CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+        text, tokenize = "unicode61 remove_diacritics 2"
+    )
+'''
+FILL_POST_INDEX = '''
+    INSERT INTO posts_post_fts(rowid, text)
+    SELECT id, replace(replace(text, 'ё', 'е'), 'Ё', 'Е') FROM posts_post
+'''
+
+
+def recreate_index(create, fill):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        schema_editor.execute('DROP TABLE posts_post_fts')
+        schema_editor.execute(create)
+        schema_editor.execute(fill)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_post_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTask',
+            fields=[
+                ('post_id', models.PositiveIntegerField(primary_key=True, serialize=False, verbose_name='Пост')),
+                ('queued', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Поставлена в очередь')),
+            ],
+            options={
+                'verbose_name': 'Задача поискового индекса',
+                'verbose_name_plural': 'Задачи поискового индекса',
+            },
+        ),
+        migrations.RunPython(
+            recreate_index(CREATE_INDEX, FILL_INDEX),
+            recreate_index(CREATE_POST_INDEX, FILL_POST_INDEX),
+        ),
+    ]
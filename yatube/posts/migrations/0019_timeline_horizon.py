@@ -0,0 +1,55 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def set_horizons(apps, schema_editor):
+    # Что выпало из ящиков раньше, неизвестно, поэтому граница ставится
+    # по самой старой записи ящика, а для пустого ящика - на сейчас:
+    # все более старые посты лента дочитает из подписок.
+    Follow = apps.get_model('posts', 'Follow')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    TimelineHorizon = apps.get_model('posts', 'TimelineHorizon')
+    oldest = dict(TimelineEntry.objects.order_by().values('user').annotate(
+        oldest=Min('pub_date')).values_list('user', 'oldest'))
+    now = django.utils.timezone.now()
+    TimelineHorizon.objects.bulk_create(
+        TimelineHorizon(user_id=user_id, pub_date=oldest.get(user_id, now))
+        for user_id in Follow.objects.order_by().values_list(
+            'user', flat=True).distinct()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0018_search_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineHorizon',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='timeline_horizon', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+            ],
+            options={
+                'verbose_name': 'Горизонт ленты подписок',
+                'verbose_name_plural': 'Горизонты лент подписок',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='timelineentry',
+            name='timeline_user_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='timeline_user_feed_idx'),
+        ),
+        migrations.RunPython(set_horizons, migrations.RunPython.noop),
+    ]
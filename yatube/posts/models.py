@@ -1,5 +1,11 @@
-from django.db import models
+from itertools import islice
+
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from .storage import content_storage, is_content_addressed
 
 User = get_user_model()
 
@@ -24,6 +30,25 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+
+    FEED_FIELDS = (
+        'text',
+        'pub_date',
+        'updated',
+        'image',
+        'author__username',
+        'author__first_name',
+        'author__last_name',
+        'group__slug',
+        'group__title',
+    )
+
+    def for_feed(self):
+        """Посты для лент: автор и группа одним запросом, без лишних полей."""
+        return self.select_related('author', 'group').only(*self.FEED_FIELDS)
+
+
 class Post(models.Model):
 
     PATTERN = '''
@@ -38,6 +63,10 @@ class Post(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -56,14 +85,28 @@ class Post(models.Model):
     image = models.ImageField(
         verbose_name='Картинка',
         upload_to='posts/',
+        storage=content_storage,
         blank=True,
         null=True
     )
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Индексы повторяют сортировку лент (pub_date, id) из KeysetPaginator.
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_feed_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_feed_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_feed_idx'),
+        ]
 
     def __str__(self):
         return self.PATTERN.format(
@@ -74,6 +117,82 @@ class Post(models.Model):
         )
 
 
+class Match(models.Lookup):
+    """Полнотекстовое условие SQLite FTS5: ``text__match='"кот"*'``.
+
+    Условие ставится на всю таблицу индекса, а не на колонку: FTS5
+    умеет ограничивать поиск колонками в самом выражении
+    (``{text} : ...``), а bm25 считается только при таком MATCH.
+    """
+
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        table = connection.ops.quote_name(self.lhs.alias)
+        return f'{table} MATCH {rhs}', rhs_params
+
+
+class FullTextField(models.TextField):
+    """Колонка виртуальной таблицы FTS5."""
+
+
+FullTextField.register_lookup(Match)
+
+
+class PostSearch(models.Model):
+    """Строка полнотекстового индекса постов.
+
+    Таблица FTS5 создается миграцией и ORM не управляется; rowid строки
+    совпадает с id поста, что позволяет присоединять индекс к постам.
+    """
+
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search_entry',
+        verbose_name='Пост'
+    )
+    text = FullTextField(verbose_name='Текст')
+    comments = FullTextField(verbose_name='Комментарии')
+
+    class Meta:
+        managed = False
+        db_table = 'posts_post_fts'
+        verbose_name = 'Поисковый индекс поста'
+        verbose_name_plural = 'Поисковый индекс постов'
+
+    def __str__(self):
+        return f'{self.post_id}'
+
+
+class SearchTask(models.Model):
+    """Пост, строку поискового индекса которого нужно обновить.
+
+    Внешнего ключа нет: удаленный пост тоже ставится в очередь, чтобы
+    воркер убрал его из индекса.
+    """
+
+    post_id = models.PositiveIntegerField(
+        primary_key=True,
+        verbose_name='Пост'
+    )
+    queued = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+        verbose_name='Поставлена в очередь'
+    )
+
+    class Meta:
+        verbose_name = 'Задача поискового индекса'
+        verbose_name_plural = 'Задачи поискового индекса'
+
+    def __str__(self):
+        return f'{self.post_id} @ {self.queued}'
+
+
 class Comment(models.Model):
 
     PATTERN = 'POST: {post}, AUTHOR: {author}, DATE: {date}, TEXT: {text:.15}.'
@@ -103,6 +222,10 @@ class Comment(models.Model):
         ordering = ('-created',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', '-created'], name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return self.PATTERN.format(
@@ -143,3 +266,244 @@ class Follow(models.Model):
             user=self.user.username,
             author=self.author.username,
         )
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_user_post')
+        ]
+        # Повторяет сортировку ленты подписок (дата, пост) из timeline.
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_feed_idx')
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} <- {self.post_id}'
+
+
+class TimelineHorizon(models.Model):
+    """Граница полноты ящика ленты подписок.
+
+    Посты, опубликованные не позже pub_date, могли не попасть в ящик
+    или выпасть из него при подрезке; их лента читает из подписок.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='timeline_horizon',
+        verbose_name='Подписчик'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Горизонт ленты подписок'
+        verbose_name_plural = 'Горизонты лент подписок'
+
+    def __str__(self):
+        return f'{self.user_id} <= {self.pub_date}'
+
+
+class ThumbnailTask(models.Model):
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='thumbnail_task',
+        verbose_name='Пост'
+    )
+    queued = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+        verbose_name='Поставлена в очередь'
+    )
+
+    class Meta:
+        verbose_name = 'Задача на миниатюры'
+        verbose_name_plural = 'Задачи на миниатюры'
+
+    def __str__(self):
+        return f'{self.post_id} @ {self.queued}'
+
+
+def _count_subquery(model, field):
+    return Coalesce(
+        models.Subquery(
+            model.objects.filter(**{field: models.OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=models.Count('pk'))
+            .values('total')
+        ),
+        0
+    )
+
+
+class UserStatsManager(models.Manager):
+
+    BATCH_SIZE = 1000
+
+    def rebuild(self, user_ids=None):
+        """Пересчитывает счетчики с нуля, возвращает число записей."""
+        users = User.objects.order_by('pk')
+        if user_ids is not None:
+            users = users.filter(pk__in=user_ids)
+        rows = users.annotate(
+            posts_total=_count_subquery(Post, 'author'),
+            followers_total=_count_subquery(Follow, 'author'),
+            following_total=_count_subquery(Follow, 'user'),
+            comments_total=_count_subquery(Comment, 'author'),
+        ).values_list(
+            'pk',
+            'posts_total',
+            'followers_total',
+            'following_total',
+            'comments_total',
+        ).iterator(chunk_size=self.BATCH_SIZE)
+        total = 0
+        with transaction.atomic():
+            stats = self.all()
+            if user_ids is not None:
+                stats = stats.filter(user_id__in=user_ids)
+            stats.delete()
+            while True:
+                batch = [
+                    UserStats(
+                        user_id=pk,
+                        posts_count=posts,
+                        followers_count=followers,
+                        following_count=following,
+                        comments_count=comments,
+                    )
+                    for pk, posts, followers, following, comments
+                    in islice(rows, self.BATCH_SIZE)
+                ]
+                if not batch:
+                    return total
+                self.bulk_create(batch)
+                total += len(batch)
+
+    def for_user(self, user):
+        try:
+            return user.stats
+        except UserStats.DoesNotExist:
+            self.rebuild([user.pk])
+            return self.get(user=user)
+
+    def change(self, user_id, field, delta):
+        """Атомарно сдвигает счетчик; недостающую запись пересчитывает."""
+        stats = self.filter(user_id=user_id)
+        if delta < 0:
+            stats = stats.filter(**{f'{field}__gte': -delta})
+        if not stats.update(**{field: models.F(field) + delta}) and delta > 0:
+            self.rebuild([user_id])
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Постов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписок'
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Комментариев'
+    )
+
+    objects = UserStatsManager()
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.posts_count} постов'
+
+
+class MediaBlobManager(models.Manager):
+
+    def acquire(self, name):
+        if not self.filter(name=name).update(
+                references=models.F('references') + 1):
+            _, created = self.get_or_create(
+                name=name, defaults={'references': 1})
+            if not created:
+                self.filter(name=name).update(
+                    references=models.F('references') + 1)
+
+    def release(self, name):
+        """Снимает ссылку; True, если файл больше никому не нужен."""
+        self.filter(name=name, references__gt=0).update(
+            references=models.F('references') - 1)
+        deleted, _ = self.filter(name=name, references=0).delete()
+        return deleted > 0
+
+    def rebuild(self):
+        """Пересчитывает ссылки по постам, возвращает число файлов."""
+        counts = Post.objects.exclude(image='').exclude(
+            image=None).order_by().values('image').annotate(
+            total=models.Count('pk')).values_list('image', 'total')
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(
+                MediaBlob(name=name, references=total)
+                for name, total in counts.iterator()
+                if is_content_addressed(name)
+            )
+        return self.count()
+
+
+class MediaBlob(models.Model):
+    name = models.CharField(
+        max_length=255,
+        primary_key=True,
+        verbose_name='Файл'
+    )
+    references = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Ссылок'
+    )
+
+    objects = MediaBlobManager()
+
+    class Meta:
+        verbose_name = 'Файл медиа'
+        verbose_name_plural = 'Файлы медиа'
+
+    def __str__(self):
+        return f'{self.name} ({self.references})'
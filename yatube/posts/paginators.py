@@ -0,0 +1,170 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class KeysetPaginator(Paginator):
+    """Пагинатор по ключу сортировки вместо OFFSET.
+
+    Каждая страница выбирается условием «после/до последней строки
+    предыдущей страницы», поэтому стоимость запроса не зависит от глубины.
+    Курсоры непрозрачны для клиента: это base64 от направления и значений
+    полей ``ordering``. Общее число объектов считается только по
+    требованию; при заданном ``count_limit`` подсчет ограничен этим
+    числом и дает приблизительный итог.
+    """
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-pk'), count_limit=None):
+        super().__init__(object_list.order_by(*ordering), per_page)
+        self.ordering = [
+            (name.lstrip('-'), name.startswith('-')) for name in ordering
+        ]
+        self.count_limit = count_limit
+
+    @cached_property
+    def count(self):
+        if self.count_limit is None:
+            return super().count
+        return self.object_list[:self.count_limit].count()
+
+    @property
+    def count_is_approximate(self):
+        return (
+            self.count_limit is not None and self.count >= self.count_limit
+        )
+
+    def encode_cursor(self, obj, direction):
+        values = []
+        for name, _ in self.ordering:
+            value = getattr(obj, name)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        raw = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(raw.decode())
+        except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+            raise InvalidCursor('Некорректный курсор')
+        if (
+            direction not in (NEXT, PREVIOUS)
+            or not isinstance(values, list)
+            or len(values) != len(self.ordering)
+            # Ключи курсора - строки и числа; null, логические значения
+            # и вложенные структуры приходят только из подделанного курсора.
+            or not all(
+                isinstance(value, (str, int, float))
+                and not isinstance(value, bool)
+                for value in values
+            )
+        ):
+            raise InvalidCursor('Некорректный курсор')
+        try:
+            return direction, [
+                self._to_python(name, value)
+                for (name, _), value in zip(self.ordering, values)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            raise InvalidCursor('Некорректный курсор')
+
+    def _to_python(self, name, value):
+        opts = self.object_list.model._meta
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field.to_python(value)
+        try:
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            return value
+        return field.to_python(value)
+
+    def _seek(self, values, forward):
+        condition = Q()
+        for index, (name, descending) in enumerate(self.ordering):
+            lookup = 'lt' if descending == forward else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[index]})
+            for position, (previous, _) in enumerate(self.ordering[:index]):
+                step &= Q(**{previous: values[position]})
+            condition |= step
+        # Избыточная граница по первому полю позволяет базе читать
+        # индекс диапазоном, а не разбирать OR по отдельным индексам.
+        name, descending = self.ordering[0]
+        lookup = 'lte' if descending == forward else 'gte'
+        return Q(**{f'{name}__{lookup}': values[0]}) & condition
+
+    def _make_page(self, rows, has_next, has_previous):
+        # Шаблоны и тесты ожидают именно Page, поэтому навигация
+        # по курсорам задается на экземпляре страницы.
+        page = self._get_page(rows, None, self)
+        page.has_next = lambda: has_next
+        page.has_previous = lambda: has_previous
+        page.next_cursor = (
+            self.encode_cursor(rows[-1], NEXT) if has_next else None
+        )
+        page.previous_cursor = (
+            self.encode_cursor(rows[0], PREVIOUS) if has_previous else None
+        )
+        return page
+
+    def seek(self, cursor):
+        """Направление курсора и строки за ним в порядке выборки."""
+        direction, values = self.decode_cursor(cursor)
+        return direction, self._after(self.object_list, direction, values)
+
+    def _after(self, queryset, direction, values):
+        if values is not None:
+            queryset = queryset.filter(
+                self._seek(values, forward=direction == NEXT))
+        if direction == PREVIOUS:
+            queryset = queryset.reverse()
+        return queryset
+
+    def fetch(self, direction, values, limit):
+        """До limit строк за курсором в порядке выборки.
+
+        values равно None для первой страницы.
+        """
+        return list(self._after(self.object_list, direction, values)[:limit])
+
+    def page(self, cursor=None):
+        limit = self.per_page + 1
+        if not cursor:
+            rows = self.fetch(NEXT, None, limit)
+            return self._make_page(
+                rows[:self.per_page], len(rows) > self.per_page, False
+            )
+        direction, values = self.decode_cursor(cursor)
+        rows = self.fetch(direction, values, limit)
+        if not rows:
+            # За курсором ничего не осталось, например хвост ленты
+            # удален: вместо пустой страницы показывается первая.
+            return self.page()
+        if direction == NEXT:
+            return self._make_page(
+                rows[:self.per_page], len(rows) > self.per_page, True
+            )
+        return self._make_page(
+            rows[:self.per_page][::-1], True, len(rows) > self.per_page
+        )
+
+    def get_page(self, cursor=None):
+        try:
+            return self.page(cursor)
+        except InvalidPage:
+            return self.page()
@@ -0,0 +1,157 @@
+import re
+from collections import Counter
+from contextlib import ContextDecorator
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext, override_settings
+
+# Наибольшее число запросов к базе на один запрос к странице при пустом
+# кэше, вместе с чтением сессии и пользователя. Обращения к таблице кэша
+# считаются отдельно, по CACHE_BUDGETS; команды управления транзакциями
+# не считаются.
+BUDGETS = {
+    'posts:main_page': 5,
+    'posts:group_posts': 6,
+    'posts:profile': 8,
+    'posts:post_detail': 6,
+    'posts:post_create': 10,
+    'posts:post_edit': 9,
+    'posts:add_comment': 6,
+    'posts:follow_index': 5,
+    'posts:profile_follow': 11,
+    'posts:profile_unfollow': 10,
+    'posts:search': 4,
+    'api:index': 2,
+    'api:group_posts': 3,
+    'api:profile': 3,
+    'api:post_detail': 3,
+    'api:follow_index': 5,
+}
+# Наибольшее число запросов к таблице кэша при пустом кэше: с другим
+# бэкендом кэша они уходят из базы, но пока кэш в базе, нагружают ее.
+CACHE_BUDGETS = {
+    'posts:main_page': 30,
+    'posts:group_posts': 31,
+    'posts:profile': 31,
+    'posts:post_detail': 16,
+    'posts:post_create': 4,
+    'posts:post_edit': 4,
+    'posts:add_comment': 3,
+    'posts:follow_index': 10,
+    'posts:profile_follow': 3,
+    'posts:profile_unfollow': 3,
+    'posts:search': 4,
+    'api:index': 9,
+    'api:group_posts': 9,
+    'api:profile': 9,
+    'api:post_detail': 5,
+    'api:follow_index': 9,
+}
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+TRANSACTION_CONTROL = re.compile(
+    r'^(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE SAVEPOINT)\b')
+
+
+def cache_tables():
+    return {
+        params['LOCATION'] for params in settings.CACHES.values()
+        if params['BACKEND'].endswith('.DatabaseCache')
+    }
+
+
+def shape(sql):
+    """SQL без значений: одинаковые по форме запросы выдают N+1."""
+    return LITERALS.sub('?', sql)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class query_budget(ContextDecorator):
+    """Проверяет, что код внутри укладывается в бюджет запросов страницы.
+
+    Работает как контекстный менеджер и как декоратор теста, в TestCase
+    и в pytest. При превышении падает со списком запросов, где лишние
+    отмечены «+», и с запросами, повторяющимися по форме.
+    """
+
+    def __init__(self, url_name, budget=None, cache_budget=None,
+                 using=DEFAULT_DB_ALIAS):
+        self.url_name = url_name
+        self.budget = BUDGETS[url_name] if budget is None else budget
+        self.cache_budget = (
+            CACHE_BUDGETS[url_name] if cache_budget is None else cache_budget
+        )
+        self.using = using
+
+    def __enter__(self):
+        # Выборочный замер пишет статистику в кэш и делает число
+        # запросов к кэшу случайным; бюджет считается без него.
+        self.sampling = override_settings(INSTRUMENTATION_SAMPLE_RATE=0)
+        self.sampling.enable()
+        self.context = CaptureQueriesContext(connections[self.using])
+        self.context.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        self.sampling.disable()
+        if exc_type is not None:
+            return False
+        reports = [
+            self.report(queries, budget, target)
+            for queries, budget, target in [
+                (self.queries, self.budget, 'базе'),
+                (self.cache_queries, self.cache_budget, 'кэшу'),
+            ]
+            if len(queries) > budget
+        ]
+        if reports:
+            raise QueryBudgetExceeded('\n'.join(reports))
+        return False
+
+    def _split(self):
+        tables = cache_tables()
+        queries, cache_queries = [], []
+        for query in self.context.captured_queries:
+            sql = query['sql']
+            if TRANSACTION_CONTROL.match(sql):
+                continue
+            if any(f'"{table}"' in sql for table in tables):
+                cache_queries.append(sql)
+            else:
+                queries.append(sql)
+        return queries, cache_queries
+
+    @property
+    def queries(self):
+        return self._split()[0]
+
+    @property
+    def cache_queries(self):
+        """Запросы к таблицам кэша в базе."""
+        return self._split()[1]
+
+    def report(self, queries, budget=None, target='базе'):
+        if budget is None:
+            budget = self.budget
+        lines = [
+            f'{self.url_name}: {len(queries)} запросов к {target} '
+            f'при бюджете {budget}',
+            f'--- бюджет ({budget})',
+            f'+++ факт ({len(queries)})',
+        ]
+        lines += [
+            f'{"+" if number > budget else " "} {number}. {sql}'
+            for number, sql in enumerate(queries, 1)
+        ]
+        repeated = [
+            (count, sql) for sql, count
+            in Counter(map(shape, queries)).most_common() if count > 1
+        ]
+        if repeated:
+            lines.append('Повторяются по форме:')
+            lines += [f'  {count} x {sql}' for count, sql in repeated]
+        return '\n'.join(lines)
@@ -0,0 +1,200 @@
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, transaction
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Comment, Post, PostSearch, SearchTask
+from .utils import batches, in_pool_thread
+
+# Пачка укладывается в 999 параметров SQLite до 3.32.
+BATCH_SIZE = 500
+# Длинный запрос из множества слов дорог, а точнее почти не становится.
+MAX_TERMS = 8
+WORD = re.compile(r'\w+')
+TABLE = PostSearch._meta.db_table
+# Совпадение в тексте поста весит вдвое больше, чем в комментариях.
+# bm25 отрицателен: чем меньше значение, тем лучше пост подходит.
+RANK = RawSQL(f'bm25("{TABLE}", 2.0, 1.0)', (), output_field=FloatField())
+
+
+def enabled():
+    """Индекс FTS5 есть только в SQLite, остальные базы ищут через LIKE."""
+    return connection.vendor == 'sqlite'
+
+
+def normalize(text):
+    # unicode61 не сводит «ё» к «е», поэтому буква заменяется и в
+    # индексе, и в запросе.
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def terms(query):
+    return WORD.findall(normalize(query.lower()))[:MAX_TERMS]
+
+
+def to_match(query, columns=None):
+    """Запрос пользователя в выражение MATCH.
+
+    Слова берутся в кавычки, поэтому операторы FTS5 и знаки препинания
+    из запроса не разбираются. Каждое слово ищется как префикс: так
+    «кот» находит и «кота», и «котов» без словаря словоформ. columns
+    ограничивает поиск колонками индекса.
+    """
+    match = ' '.join(f'"{word}"*' for word in terms(query))
+    if columns and match:
+        match = f'{{{" ".join(columns)}}} : ({match})'
+    return match
+
+
+def matching(query, queryset, columns=None):
+    """Посты queryset, содержащие все слова запроса, без ранжирования.
+
+    bm25 нельзя вычислить вне выборки из индекса, например в COUNT(*)
+    поверх подзапроса, поэтому для подсчета годится только этот вариант.
+    """
+    if not terms(query):
+        return queryset.none()
+    if not enabled():
+        for word in terms(query):
+            queryset = queryset.filter(text__icontains=word)
+        return queryset
+    return queryset.filter(
+        search_entry__text__match=to_match(query, columns))
+
+
+def search(query, queryset=None):
+    """Найденные посты с рангом ``rank``: чем меньше, тем точнее."""
+    if queryset is None:
+        queryset = Post.objects.all()
+    rank = RANK if enabled() else Value(0.0, FloatField())
+    return matching(query, queryset).annotate(rank=rank)
+
+
+def enqueue(post_ids):
+    """Ставит посты в очередь на переиндексацию одним INSERT.
+
+    Задача пишется в транзакции поста или комментария; пост, уже
+    стоящий в очереди, не дублируется.
+    """
+    if not enabled():
+        return
+    SearchTask.objects.bulk_create(
+        (SearchTask(post_id=post_id) for post_id in post_ids),
+        ignore_conflicts=True,
+    )
+
+
+def documents(post_ids):
+    """Строки индекса для постов: (id, текст, тексты комментариев)."""
+    comments = {}
+    for post_id, text in Comment.objects.filter(
+            post_id__in=post_ids).order_by('post_id', 'pk').values_list(
+            'post_id', 'text'):
+        comments.setdefault(post_id, []).append(text)
+    return [
+        (pk, normalize(text), normalize(' '.join(comments.get(pk, []))))
+        for pk, text in Post.objects.filter(
+            pk__in=post_ids).order_by().values_list('pk', 'text')
+    ]
+
+
+def write(post_ids, rows):
+    """Заменяет строки индекса постов; пост без строки удаляется."""
+    with connection.cursor() as cursor:
+        for chunk in batches(post_ids, BATCH_SIZE):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(
+                f'DELETE FROM {TABLE} WHERE rowid IN ({placeholders})',
+                chunk)
+        cursor.executemany(
+            f'INSERT INTO {TABLE}(rowid, text, comments) '
+            'VALUES (%s, %s, %s)', rows)
+
+
+def index(post_ids):
+    """Переписывает строки индекса для постов по текущему тексту."""
+    if not enabled():
+        return
+    for chunk in batches(post_ids, BATCH_SIZE):
+        write(chunk, documents(chunk))
+
+
+def process(batch_size=BATCH_SIZE):
+    """Применяет пачку задач из очереди, возвращает их число.
+
+    Задачи удаляются в одной транзакции с чтением постов: правка,
+    закоммиченная позже, поставит пост в очередь заново.
+    """
+    with transaction.atomic():
+        post_ids = list(SearchTask.objects.order_by('queued').values_list(
+            'post_id', flat=True)[:batch_size])
+        if post_ids:
+            SearchTask.objects.filter(post_id__in=post_ids).delete()
+            index(post_ids)
+    return len(post_ids)
+
+
+def index_missing():
+    """Добавляет посты, созданные мимо сигналов (bulk_create, импорт)."""
+    if not enabled():
+        return 0
+    post_ids = list(Post.objects.exclude(
+        pk__in=PostSearch.objects.values('pk')).values_list('pk', flat=True))
+    index(post_ids)
+    return len(post_ids)
+
+
+def _built(chunks, workers):
+    """Документы пачек по порядку; не больше двух пачек на поток впереди.
+
+    Executor.map сразу ставит в работу весь итератор и копит все
+    результаты, а постов могут быть миллионы.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield chunk, documents(chunk)
+        return
+    with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='search') as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(
+                (chunk, pool.submit(in_pool_thread, documents, chunk)))
+            if len(pending) >= 2 * workers:
+                chunk, future = pending.popleft()
+                yield chunk, future.result()
+        while pending:
+            chunk, future = pending.popleft()
+            yield chunk, future.result()
+
+
+def rebuild(chunk_size=BATCH_SIZE, workers=1, progress=None):
+    """Переиндексирует все посты, возвращает их число.
+
+    Идентификаторы читаются одним проходом .iterator(), документы
+    пачек собираются в пуле потоков, а пишутся в индекс из текущего
+    потока: у SQLite один писатель. Пачка заменяется целиком, поэтому
+    поиск работает и во время перестройки. progress(готово, док/с)
+    вызывается после каждой пачки.
+    """
+    if not enabled():
+        return 0
+    started = time.perf_counter()
+    done = 0
+    post_ids = Post.objects.order_by('pk').values_list(
+        'pk', flat=True).iterator(chunk_size=chunk_size)
+    for chunk, rows in _built(batches(post_ids, chunk_size), workers):
+        with transaction.atomic():
+            write(chunk, rows)
+        done += len(chunk)
+        if progress is not None:
+            progress(done, done / max(time.perf_counter() - started, 1e-6))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABLE} WHERE rowid NOT IN '
+            '(SELECT id FROM posts_post)')
+    return done
@@ -0,0 +1,85 @@
+import random
+from contextlib import contextmanager
+
+from django.db import connection
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+from . import search, timeline
+
+BATCH_SIZE = 1000
+WORDS = (
+    'лента пост автор группа подписка комментарий текст новость '
+    'фото город утро вечер дорога книга музыка кино работа отдых'
+).split()
+
+
+def _text(rnd, words):
+    return ' '.join(rnd.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def seed(users=100, groups=10, posts=1000, comments=0, follows=0,
+         random_seed=0):
+    """Быстро наполняет базу связанными данными через bulk_create.
+
+    Сигналы при этом не срабатывают, поэтому счетчики авторов, ленты
+    подписок и поисковый индекс пересчитываются в конце.
+    """
+    rnd = random.Random(random_seed)
+    User.objects.bulk_create(
+        (User(username=f'seed_user_{i}') for i in range(users)),
+    )
+    Group.objects.bulk_create(
+        (
+            Group(
+                title=f'Группа {i}',
+                slug=f'seed-group-{i}',
+                description=_text(rnd, 10),
+            )
+            for i in range(groups)
+        ),
+    )
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    group_ids = list(Group.objects.values_list('pk', flat=True))
+    for start in range(0, posts, BATCH_SIZE):
+        Post.objects.bulk_create(
+            Post(
+                text=_text(rnd, rnd.randint(5, 60)),
+                author_id=rnd.choice(user_ids),
+                group_id=rnd.choice(group_ids + [None]),
+            )
+            for _ in range(min(BATCH_SIZE, posts - start))
+        )
+    if comments:
+        post_ids = list(Post.objects.values_list('pk', flat=True))
+        for start in range(0, comments, BATCH_SIZE):
+            Comment.objects.bulk_create(
+                Comment(
+                    text=_text(rnd, rnd.randint(3, 20)),
+                    author_id=rnd.choice(user_ids),
+                    post_id=rnd.choice(post_ids),
+                )
+                for _ in range(min(BATCH_SIZE, comments - start))
+            )
+    pairs = set()
+    while len(pairs) < min(follows, len(user_ids) * (len(user_ids) - 1)):
+        user_id, author_id = rnd.sample(user_ids, 2)
+        pairs.add((user_id, author_id))
+    Follow.objects.bulk_create(
+        (Follow(user_id=user, author_id=author) for user, author in pairs),
+    )
+    UserStats.objects.rebuild()
+    search.index_missing()
+    if follows:
+        timeline.rebuild()
+
+
+@contextmanager
+def temporary_database():
+    """Временная пустая база для бенчмарков; рабочая база не трогается."""
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,173 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from . import search, timeline
+from .cache import SITE_FEED, invalidate_feeds, invalidate_group_list
+from .models import (
+    Comment, Follow, Group, MediaBlob, Post, User, UserStats
+)
+from .storage import content_storage, is_content_addressed
+
+USER_NAME_FIELDS = {'username', 'first_name', 'last_name'}
+DEFERRED = object()
+
+
+def post_feeds(post):
+    feeds = ['index', f'author:{post.author.username}']
+    if post.group_id:
+        feeds.append(f'group:{post.group.slug}')
+    return feeds
+
+
+def delete_blob(name):
+    # Пока транзакция шла, тот же файл могли загрузить снова.
+    if MediaBlob.objects.filter(name=name).exists():
+        return
+    default.kvstore.delete(ImageFile(name, content_storage))
+    content_storage.delete(name)
+
+
+def managed(name):
+    # Учитываются только файлы, сохраненные хранилищем по содержимому;
+    # старые имена сначала переносит команда dedupe_media.
+    return bool(name) and is_content_addressed(name)
+
+
+def release_image(name):
+    if managed(name) and MediaBlob.objects.release(name):
+        transaction.on_commit(lambda: delete_blob(name))
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+    # Для отложенного поля картинки ссылки не трогаем: оно не сохранится.
+    instance._loaded_image = instance.__dict__.get('image', DEFERRED)
+    instance._loaded_text = instance.__dict__.get('text', DEFERRED)
+
+
+@receiver(post_save, sender=Post)
+def post_image_saved(sender, instance, created, raw, **kwargs):
+    if raw or instance._loaded_image is DEFERRED:
+        return
+    old = None if created else instance._loaded_image
+    new = instance.image.name or None
+    if old == new:
+        return
+    if managed(new):
+        MediaBlob.objects.acquire(new)
+    release_image(old)
+    instance._loaded_image = new
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        UserStats.objects.change(instance.author_id, 'posts_count', 1)
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    feeds = post_feeds(instance)
+    loaded_group_id = getattr(instance, '_loaded_group_id', None)
+    if loaded_group_id and loaded_group_id != instance.group_id:
+        feeds += [
+            f'group:{slug}' for slug in Group.objects.filter(
+                pk=loaded_group_id).values_list('slug', flat=True)
+        ]
+    instance._loaded_group_id = instance.group_id
+    invalidate_feeds(*feeds, *timeline.follower_feeds(instance.author_id))
+
+
+@receiver(post_save, sender=Post)
+def post_text_saved(sender, instance, created, **kwargs):
+    # Индекс обновляет воркер process_search_queue; отложенный текст
+    # не сохраняется, и пост тогда в очередь не ставится.
+    text = instance.__dict__.get('text', DEFERRED)
+    if text is not DEFERRED and (created or instance._loaded_text != text):
+        search.enqueue([instance.pk])
+        instance._loaded_text = text
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    UserStats.objects.change(instance.author_id, 'posts_count', -1)
+    search.enqueue([instance.pk])
+    release_image(instance.image.name)
+    invalidate_feeds(
+        *post_feeds(instance), *timeline.follower_feeds(instance.author_id))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        UserStats.objects.change(instance.author_id, 'comments_count', 1)
+        invalidate_feeds(f'author:{instance.author.username}')
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, **kwargs):
+    search.enqueue([instance.post_id])
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    UserStats.objects.change(instance.author_id, 'comments_count', -1)
+    invalidate_feeds(f'author:{instance.author.username}')
+    search.enqueue([instance.post_id])
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        UserStats.objects.change(instance.author_id, 'followers_count', 1)
+        UserStats.objects.change(instance.user_id, 'following_count', 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        invalidate_feeds(
+            f'author:{instance.author.username}',
+            f'author:{instance.user.username}',
+            timeline.follow_feed(instance.user_id),
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    UserStats.objects.change(instance.author_id, 'followers_count', -1)
+    UserStats.objects.change(instance.user_id, 'following_count', -1)
+    timeline.forget(instance.user_id, instance.author_id)
+    restored = timeline.restore(instance.author_id)
+    invalidate_feeds(
+        f'author:{instance.author.username}',
+        f'author:{instance.user.username}',
+        timeline.follow_feed(instance.user_id),
+        *map(timeline.follow_feed, restored),
+    )
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    invalidate_group_list()
+    if not created:
+        invalidate_feeds(SITE_FEED)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    invalidate_group_list()
+    invalidate_feeds(SITE_FEED)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw, update_fields, **kwargs):
+    if created or raw:
+        return
+    if update_fields is None or USER_NAME_FIELDS & set(update_fields):
+        invalidate_feeds(SITE_FEED)
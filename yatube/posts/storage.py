@@ -0,0 +1,39 @@
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+
+DIGEST_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, в котором имя файла задает его содержимое.
+
+    Файл сохраняется как ``<каталог>/<первые два знака>/<sha256><расширение>``;
+    одинаковые загрузки получают одно имя и лежат на диске один раз.
+    Удалением файлов, на которые больше нет ссылок, занимается MediaBlob.
+    """
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+def is_content_addressed(name):
+    return bool(DIGEST_NAME.search(name))
+
+
+content_storage = ContentAddressedStorage()
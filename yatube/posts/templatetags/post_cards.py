@@ -0,0 +1,57 @@
+import hashlib
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .. import thumbnails
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/posts_page.html'
+CARD_KEY = 'post_card:{}:{}'
+
+
+def card_key(post, flags):
+    group = post.group
+    version = '|'.join(map(str, [
+        post.updated.isoformat() if post.updated else '',
+        post.author.username,
+        post.author.get_full_name(),
+        group.slug if group else '',
+        group.title if group else '',
+        *sorted(flags.items()),
+    ]))
+    return CARD_KEY.format(
+        post.pk, hashlib.md5(version.encode()).hexdigest())
+
+
+@register.simple_tag
+def post_cards(posts, crop_text=False, hide_profile=False, hide_group=False):
+    """Собирает карточки постов ленты из кэша одним запросом.
+
+    Ключ карточки меняется вместе с постом, автором и группой, поэтому
+    отсутствующие карточки просто дорисовываются и кэшируются. Миниатюры
+    для них находятся заранее одним чтением хранилища sorl.
+    """
+    flags = {
+        'crop_text': crop_text,
+        'hide_profile': hide_profile,
+        'hide_group': hide_group,
+    }
+    keys = [card_key(post, flags) for post in posts]
+    cards = cache.get_many(keys)
+    missing = [
+        (post, key) for post, key in zip(posts, keys) if key not in cards
+    ]
+    thumbnails.prefetch([post for post, _ in missing])
+    missing = {
+        key: render_to_string(CARD_TEMPLATE, {'post': post, **flags})
+        for post, key in missing
+    }
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+    return [mark_safe(cards[key]) for key in keys]
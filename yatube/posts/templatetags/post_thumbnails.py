@@ -0,0 +1,18 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(post, preset='card'):
+    """Картинка поста с вариантами для srcset или заглушка.
+
+    Шаблон никогда не создает миниатюры сам: их заранее готовит
+    воркер process_thumbnails. Миниатюры, найденные thumbnails.prefetch,
+    берутся с поста без обращения к хранилищу.
+    """
+    if not post.image:
+        return None
+    return thumbnails.picture(post, preset)
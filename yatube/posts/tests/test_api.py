@@ -0,0 +1,177 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+from yatube.settings import POSTS_IN_PAGE
+
+TEST_USERNAME_AUTHOR = 'Author_post'
+TEST_USERNAME_READER = 'Reader'
+TEST_SLUG = 'test_slug'
+
+INDEX_URL = reverse('api:index')
+GROUP_URL = reverse('api:group_posts', args=[TEST_SLUG])
+PROFILE_URL = reverse('api:profile', args=[TEST_USERNAME_AUTHOR])
+FOLLOW_URL = reverse('api:follow_index')
+
+
+class FeedApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=TEST_USERNAME_AUTHOR)
+        cls.reader = User.objects.create_user(username=TEST_USERNAME_READER)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug=TEST_SLUG,
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.author, group=cls.group)
+            for i in range(POSTS_IN_PAGE + 3)
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Последний пост', group=cls.group)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feeds_paginated_by_cursor(self):
+        """Ленты отдают посты страницами со ссылками по курсору."""
+
+        for client, url in [
+            (self.client, INDEX_URL),
+            (self.client, GROUP_URL),
+            (self.client, PROFILE_URL),
+            (self.reader_client, FOLLOW_URL),
+        ]:
+            with self.subTest(url=url):
+                first = client.get(url).json()
+                self.assertEqual(len(first['results']), POSTS_IN_PAGE)
+                self.assertEqual(first['results'][0], {
+                    'id': self.post.pk,
+                    'text': self.post.text,
+                    'pub_date': self.post.pub_date.isoformat(),
+                    'author': TEST_USERNAME_AUTHOR,
+                    'group': TEST_SLUG,
+                    'image': None,
+                })
+                self.assertIsNone(first['previous'])
+                second = client.get(first['next']).json()
+                self.assertEqual(len(second['results']), 4)
+                self.assertIsNone(second['next'])
+        group = self.client.get(GROUP_URL).json()['group']
+        self.assertEqual(group['title'], self.group.title)
+
+    def test_bad_and_exhausted_cursors(self):
+        """Подделанный и исчерпанный курсоры дают первую страницу."""
+
+        first = self.client.get(INDEX_URL).json()
+        for cursor in ['WyJuIixbbnVsbCxudWxsXV0', 'WyJuIixbMSwyXV0']:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(INDEX_URL, {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['results'], first['results'])
+        second = self.client.get(first['next']).json()
+        Post.objects.filter(
+            pk__in=[post['id'] for post in second['results']]).delete()
+        response = self.client.get(first['next'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['previous'])
+
+    def test_not_modified_without_reading_posts(self):
+        """Неизменная лента отвечает 304, не выбирая посты."""
+
+        response = self.client.get(INDEX_URL)
+        self.assertTrue(response.has_header('Last-Modified'))
+        with CaptureQueriesContext(connection) as queries:
+            not_modified = self.client.get(
+                INDEX_URL, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('"posts_post"."text"', sql)
+        # Состояние берется из индекса по дате, без подсчета строк.
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('"posts_post"."updated"', sql)
+
+    def test_etag_follows_changes(self):
+        """ETag меняется при изменении постов и переименовании группы."""
+
+        def etag():
+            return self.client.get(INDEX_URL)['ETag']
+
+        etags = [etag()]
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        etags.append(etag())
+        post.text = 'Исправленный пост'
+        post.save()
+        etags.append(etag())
+        post.delete()
+        etags.append(etag())
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        etags.append(etag())
+        for previous, current in zip(etags, etags[1:]):
+            self.assertNotEqual(previous, current)
+        self.assertEqual(self.client.get(
+            INDEX_URL, HTTP_IF_NONE_MATCH=etags[0]).status_code, 200)
+
+    def test_post_detail_with_comments(self):
+        url = reverse('api:post_detail', args=[self.post.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.json()['comments'], [])
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['comments'][0]['id'], comment.pk)
+
+    def test_follow_not_modified_by_version(self):
+        """Лента подписок сверяется по версии, не читая ленту."""
+
+        response = self.reader_client.get(FOLLOW_URL)
+        with CaptureQueriesContext(connection) as queries:
+            not_modified = self.reader_client.get(
+                FOLLOW_URL, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('"posts_post"', sql)
+        self.assertNotIn('posts_timelinehorizon', sql)
+
+    def test_follow_etag_follows_changes(self):
+        """ETag ленты подписок меняется с постами, правками и подписками."""
+
+        other = User.objects.create_user(username='Other')
+
+        def etag():
+            return self.reader_client.get(FOLLOW_URL)['ETag']
+
+        etags = [etag()]
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        etags.append(etag())
+        Post.objects.filter(pk=self.post.pk).first().save()
+        etags.append(etag())
+        Follow.objects.create(user=self.reader, author=other)
+        etags.append(etag())
+        with override_settings(TIMELINE_FANOUT_LIMIT=0):
+            Post.objects.create(author=other, text='Пост без раскладки')
+            etags.append(etag())
+        post.delete()
+        etags.append(etag())
+        Follow.objects.filter(user=self.reader, author=other).delete()
+        etags.append(etag())
+        self.assertEqual(len(set(etags)), len(etags))
+
+    def test_follow_requires_login(self):
+        self.assertEqual(self.client.get(FOLLOW_URL).status_code, 401)
+
+    def test_read_only(self):
+        self.assertEqual(self.client.post(INDEX_URL).status_code, 405)
@@ -0,0 +1,24 @@
+from django.test import TestCase
+
+from ..benchmark import ENDPOINTS, percentile, run
+from ..seed import seed
+
+
+class LoadBenchmarkTests(TestCase):
+    def test_percentile_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+
+    def test_all_endpoints_measured(self):
+        """Каждое представление отвечает без ошибок и попадает в отчет."""
+        seed(users=5, groups=2, posts=30, comments=10, follows=10)
+        results = run(requests=3, warmup=1)
+        self.assertEqual(list(results), list(ENDPOINTS))
+        for name, result in results.items():
+            with self.subTest(endpoint=name):
+                self.assertEqual(result['requests'], 3)
+                self.assertEqual(result['errors'], 0)
+                self.assertGreater(result['queries_per_request'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
@@ -0,0 +1,162 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+
+from ..models import Comment, Follow, Group, Post, User
+
+TEST_USERNAME_AUTHOR = 'Author_post'
+TEST_USERNAME_READER = 'Reader'
+TEST_SLUG = 'test_slug'
+
+GROUP_LIST_URL = reverse('posts:group_posts', args=[TEST_SLUG])
+PROFILE_URL = reverse('posts:profile', args=[TEST_USERNAME_AUTHOR])
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+class ConditionalPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=TEST_USERNAME_AUTHOR)
+        cls.reader = User.objects.create_user(username=TEST_USERNAME_READER)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug=TEST_SLUG,
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Тестовый пост', group=cls.group)
+        cls.POST_DETAIL_URL = reverse(
+            'posts:post_detail', args=[cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def revalidate(self, client, url, response):
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_pages_not_modified(self):
+        """Повторный запрос неизмененной страницы получает 304."""
+
+        for url in [GROUP_LIST_URL, PROFILE_URL, self.POST_DETAIL_URL]:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(
+                    response.has_header('Last-Modified'),
+                    url == self.POST_DETAIL_URL)
+                self.assertIn('no-cache', response['Cache-Control'])
+                self.assertIn('private', response['Cache-Control'])
+                repeat = self.revalidate(self.client, url, response)
+                self.assertEqual(repeat.status_code, 304)
+                self.assertEqual(repeat.content, b'')
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_not_modified_costs_one_query(self):
+        """Проверка свежести - не больше одного запроса, без рендера.
+
+        Ленты сверяются только по версиям в кэше, без базы.
+        """
+
+        for url, queries in [
+            (GROUP_LIST_URL, 0),
+            (PROFILE_URL, 0),
+            (self.POST_DETAIL_URL, 1),
+        ]:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                with self.assertNumQueries(queries):
+                    self.assertEqual(self.revalidate(
+                        self.client, url, response).status_code, 304)
+
+    def test_edit_not_hidden_by_if_modified_since(self):
+        """Правка поста не дает 304 клиенту с одним If-Modified-Since."""
+
+        post = Post.objects.create(
+            author=self.author, text='Старый текст', group=self.group)
+        since = http_date(time.time() + 60)
+        self.client.get(GROUP_LIST_URL)
+        post.text = 'Новый текст'
+        post.save()
+        response = self.client.get(
+            GROUP_LIST_URL, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новый текст')
+
+    def test_post_detail_etag_depends_on_csrf(self):
+        """После нового входа форма комментария рисуется с новым токеном."""
+
+        client = Client()
+        client.force_login(self.reader)
+        # Первый ответ выставляет cookie CSRF.
+        client.get(self.POST_DETAIL_URL)
+        response = client.get(self.POST_DETAIL_URL)
+        self.assertEqual(
+            self.revalidate(client, self.POST_DETAIL_URL, response
+                            ).status_code, 304)
+        client.cookies[settings.CSRF_COOKIE_NAME] = 'x' * 64
+        self.assertEqual(
+            self.revalidate(client, self.POST_DETAIL_URL, response
+                            ).status_code, 200)
+
+    def test_stale_copy_sent_without_validators(self):
+        """Копия, отданная во время пересборки, не получает новый ETag."""
+
+        response = self.client.get(GROUP_LIST_URL)
+        Post.objects.create(
+            author=self.reader, text='Новый пост', group=self.group)
+        with mock.patch.object(cache, 'add', return_value=False):
+            stale = self.revalidate(self.client, GROUP_LIST_URL, response)
+        self.assertEqual(stale.status_code, 200)
+        self.assertNotContains(stale, 'Новый пост')
+        self.assertFalse(stale.has_header('ETag'))
+        self.assertFalse(stale.has_header('Last-Modified'))
+        fresh = self.revalidate(self.client, GROUP_LIST_URL, response)
+        self.assertContains(fresh, 'Новый пост')
+        self.assertTrue(fresh.has_header('ETag'))
+
+    def test_changes_refresh_pages(self):
+        """Новые посты, комментарии и подписки меняют ETag."""
+
+        cases = [
+            (GROUP_LIST_URL, lambda: Post.objects.create(
+                author=self.reader, text='Новый пост', group=self.group)),
+            (PROFILE_URL, lambda: Follow.objects.create(
+                user=self.reader, author=self.author)),
+            (self.POST_DETAIL_URL, lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий')),
+        ]
+        for url, change in cases:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                change()
+                self.assertEqual(
+                    self.revalidate(self.client, url, response).status_code,
+                    200)
+
+    def test_etag_depends_on_user(self):
+        """Страница гостя не подходит вошедшему пользователю."""
+
+        response = self.client.get(self.POST_DETAIL_URL)
+        self.assertEqual(self.revalidate(
+            self.reader_client, self.POST_DETAIL_URL, response
+        ).status_code, 200)
+
+    def test_missing_objects_not_found(self):
+        for url in [
+            reverse('posts:group_posts', args=['missing']),
+            reverse('posts:profile', args=['missing']),
+            reverse('posts:post_detail', args=[self.post.pk + 100]),
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
@@ -0,0 +1,98 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Follow, Group, Post, User
+
+TEST_USERNAME_AUTHOR = 'Author_post'
+TEST_USERNAME_READER = 'Reader'
+OLD_DATE = timezone.make_aware(datetime(2015, 6, 1, 12, 30))
+
+
+class ExportContentTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=TEST_USERNAME_AUTHOR)
+        cls.reader = User.objects.create_user(username=TEST_USERNAME_READER)
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Старый пост', group=cls.group)
+        Post.objects.filter(pk=cls.old_post.pk).update(pub_date=OLD_DATE)
+        cls.post = Post.objects.create(author=cls.author, text='Новый пост')
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def export(self, *args, **options):
+        path = os.path.join(self.directory, 'export.gz')
+        call_command(
+            'export_content', *args, output=path, stdout=StringIO(),
+            **options)
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            return file.read()
+
+    def test_jsonl_export_since(self):
+        """Инкрементальная выгрузка берет только посты начиная с даты."""
+
+        lines = self.export('posts', since='2020-01-01').splitlines()
+        self.assertEqual(len(lines), 1)
+        row = json.loads(lines[0])
+        self.assertEqual(row['id'], self.post.pk)
+        self.assertEqual(row['author'], TEST_USERNAME_AUTHOR)
+        self.assertIsNone(row['group'])
+        self.assertEqual(row['text'], 'Новый пост')
+
+    def test_csv_export_imports_back(self):
+        """CSV выгрузки читается import_content с теми же датами."""
+
+        content = self.export('posts', format='csv')
+        self.assertTrue(content.startswith('id,author,group,text,pub_date'))
+        path = os.path.join(self.directory, 'posts.csv')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        Post.objects.all().delete()
+        call_command('import_content', posts=path, stdout=StringIO())
+        old_post = Post.objects.get(pk=self.old_post.pk)
+        self.assertEqual(old_post.pub_date, OLD_DATE)
+        self.assertEqual(old_post.group, self.group)
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_streaming_endpoint(self):
+        """Сотрудник получает сжатый поток, остальные - нет."""
+
+        url = reverse('export_content', args=['follows'])
+        staff_client = Client()
+        staff_client.force_login(self.staff)
+        response = staff_client.get(url, {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        content = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(
+            content.decode().splitlines(),
+            ['user,author', f'{TEST_USERNAME_READER},{TEST_USERNAME_AUTHOR}'])
+        self.assertEqual(
+            staff_client.get(url, {'since': 'вчера'}).status_code, 400)
+        self.assertEqual(staff_client.get(
+            reverse('export_content', args=['users'])).status_code, 404)
+        reader_client = Client()
+        reader_client.force_login(self.reader)
+        self.assertEqual(reader_client.get(url).status_code, 302)
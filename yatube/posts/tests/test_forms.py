@@ -1,11 +1,18 @@
+import hashlib
 import shutil
+from io import BytesIO
 
 from django import forms
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template.defaultfilters import filesizeformat
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 
+from PIL import Image
+
+from ..forms import PostForm
 from ..models import Post, Group, User, Comment
+from ..uploads import BoundedFileUploadHandler
 from django.conf import settings
 import tempfile
 
@@ -92,7 +99,9 @@ class PostFormTests(TestCase):
         cls.author_post_client = Client()
         cls.author_post_client.force_login(cls.user)
 
-    def tearDown(self):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def test_form_post_create(self):
@@ -145,8 +154,10 @@ class PostFormTests(TestCase):
         self.assertEqual(post.text, data['text'])
         self.assertEqual(post.group.id, data['group'])
         self.assertEqual(post.author, self.post.author)
+        digest = hashlib.sha256(TEST_IMAGE_2).hexdigest()
         self.assertEqual(
-            post.image.name, Post.image.field.upload_to + data['image'].name
+            post.image.name,
+            f'{Post.image.field.upload_to}{digest[:2]}/{digest}.gif'
         )
 
     def test_form_comment(self):
@@ -261,3 +272,83 @@ class PostFormTests(TestCase):
                 self.POST_DETAIL_URL).context['form'].fields['text'],
             forms.fields.CharField
         )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostFormUploadLimitsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=TEST_USERNAME_AUTHOR)
+        cls.author_post_client = Client()
+        cls.author_post_client.force_login(cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    @staticmethod
+    def png(size):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'PNG')
+        return SimpleUploadedFile('image.png', buffer.getvalue(), 'image/png')
+
+    def create(self, image):
+        return self.author_post_client.post(CREATE_URL, data={
+            'text': 'Пост с картинкой',
+            'image': image,
+        })
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=64)
+    def test_too_large_file_rejected(self):
+        """Файл больше лимита отклоняется, пост не создается."""
+        response = self.create(self.png((100, 100)))
+        self.assertFormError(
+            response, 'form', 'image',
+            PostForm.TOO_LARGE.format(limit=filesizeformat(64)))
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=64)
+    def test_too_large_file_rejected_in_admin(self):
+        """Форма поста в админке тоже сообщает о превышении размера."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        client = Client()
+        client.force_login(admin)
+        response = client.post(reverse('admin:posts_post_add'), data={
+            'text': 'Пост с картинкой',
+            'author': admin.pk,
+            'image': self.png((100, 100)),
+        })
+        self.assertFormError(
+            response, 'adminform', 'image',
+            PostForm.TOO_LARGE.format(limit=filesizeformat(64)))
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=100)
+    def test_too_many_pixels_rejected(self):
+        """Картинка больше лимита пикселей отклоняется."""
+        response = self.create(self.png((20, 20)))
+        self.assertFormError(
+            response, 'form', 'image',
+            PostForm.TOO_MANY_PIXELS.format(limit=0))
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(IMAGE_MAX_SIDE=10)
+    def test_giant_original_downscaled(self):
+        """Слишком большой оригинал сохраняется уменьшенным."""
+        self.create(self.png((40, 20)))
+        with Image.open(Post.objects.get().image) as image:
+            self.assertEqual(image.size, (10, 5))
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=10)
+    def test_upload_handler_stops_writing_after_limit(self):
+        """Обработчик хранит не больше лимита, но помнит полный размер."""
+        handler = BoundedFileUploadHandler()
+        handler.new_file('image', 'image.png', 'image/png', 100)
+        for start in range(0, 100, 8):
+            handler.receive_data_chunk(b'x' * 8, start)
+        upload = handler.file_complete(104)
+        self.assertEqual(upload.size, 104)
+        self.assertEqual(len(upload.read()), 8)
@@ -0,0 +1,132 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+
+TEST_USERNAME_AUTHOR = 'Author_post'
+TEST_USERNAME_READER = 'Reader'
+TEST_SLUG = 'test_slug'
+PUB_DATE = '2015-06-01T12:30:00'
+
+
+class ImportContentTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=TEST_USERNAME_AUTHOR)
+        cls.reader = User.objects.create_user(username=TEST_USERNAME_READER)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug=TEST_SLUG,
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def posts_file(self):
+        rows = [
+            {'id': 100, 'author': TEST_USERNAME_AUTHOR, 'group': TEST_SLUG,
+             'text': 'Импортированный пост', 'pub_date': PUB_DATE},
+            {'id': 101, 'author': TEST_USERNAME_AUTHOR,
+             'text': 'Пост без группы'},
+            {'id': 102, 'author': 'unknown', 'text': 'Чужой пост'},
+        ]
+        return self.write(
+            'posts.jsonl', ''.join(json.dumps(row) + '\n' for row in rows))
+
+    def import_content(self, **files):
+        out = StringIO()
+        call_command('import_content', stdout=out, **files)
+        return out.getvalue()
+
+    def test_import_keeps_dates_and_skips_invalid_rows(self):
+        """Даты сохраняются, строки с неизвестными ссылками пропускаются."""
+
+        output = self.import_content(
+            posts=self.posts_file(),
+            comments=self.write(
+                'comments.csv',
+                'post,author,text,created\n'
+                f'100,{TEST_USERNAME_READER},Комментарий,{PUB_DATE}\n'
+                f'999,{TEST_USERNAME_READER},К чужому посту,\n'
+            ),
+            follows=self.write(
+                'follows.csv',
+                'user,author\n'
+                f'{TEST_USERNAME_READER},{TEST_USERNAME_AUTHOR}\n'
+                f'{TEST_USERNAME_READER},{TEST_USERNAME_READER}\n'
+            ),
+        )
+        expected_date = timezone.make_aware(datetime(2015, 6, 1, 12, 30))
+        post = Post.objects.get(pk=100)
+        self.assertEqual(post.pub_date, expected_date)
+        self.assertEqual(post.group, self.group)
+        self.assertFalse(Post.objects.filter(pk=102).exists())
+        comment = Comment.objects.get()
+        self.assertEqual(comment.created, expected_date)
+        self.assertEqual(comment.post, post)
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.author).exists())
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertIn('posts: 2 строк', output)
+        self.assertIn('пропущено 1', output)
+
+    def test_import_updates_derived_data(self):
+        """После импорта верны счетчики, ленты подписок и кэш лент."""
+
+        index = self.client.get(reverse('posts:main_page')).content
+        self.assertNotIn('Импортированный пост'.encode(), index)
+        self.import_content(
+            posts=self.posts_file(),
+            follows=self.write(
+                'follows.jsonl',
+                json.dumps({'user': TEST_USERNAME_READER,
+                            'author': TEST_USERNAME_AUTHOR}) + '\n'
+            ),
+        )
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 2)
+        self.assertEqual(self.author.stats.followers_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2)
+        index = self.client.get(reverse('posts:main_page')).content
+        self.assertIn('Импортированный пост'.encode(), index)
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertGreater(new_post.pk, 101)
+
+    def test_import_counts_only_new_follows(self):
+        """Существующие и повторные подписки не попадают в итог."""
+
+        Follow.objects.create(user=self.reader, author=self.author)
+        other = User.objects.create_user(username='Other')
+        output = self.import_content(
+            follows=self.write(
+                'follows.csv',
+                'user,author\n'
+                f'{TEST_USERNAME_READER},{TEST_USERNAME_AUTHOR}\n'
+                f'Other,{TEST_USERNAME_AUTHOR}\n'
+                f'Other,{TEST_USERNAME_AUTHOR}\n'
+            ),
+        )
+        self.assertIn('follows: 1 строк', output)
+        self.assertIn('пропущено 2', output)
+        self.assertTrue(Follow.objects.filter(
+            user=other, author=self.author).exists())
+        self.assertEqual(Follow.objects.count(), 2)
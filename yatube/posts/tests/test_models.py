@@ -1,6 +1,8 @@
 from django.test import TestCase
 
 from ..models import Group, Post, User, Comment, Follow
+from ..paginators import NEXT, KeysetPaginator
+from yatube.settings import POSTS_IN_PAGE
 
 TEST_SLUG = 'test_slug'
 TEST_USERNAME_AUTHOR = 'Author_post'
@@ -93,3 +95,23 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     Post._meta.get_field(field).help_text, expected_value)
+
+    def test_feed_queries_use_indexes(self):
+        """Страницы лент читаются по индексам без полной сортировки."""
+        cursor = KeysetPaginator(
+            Post.objects.all(), POSTS_IN_PAGE).encode_cursor(self.post, NEXT)
+        feeds = {
+            'index': Post.objects.for_feed(),
+            'profile': self.user.posts.for_feed(),
+            'group_posts': self.group.posts.for_feed(),
+        }
+        for name, queryset in feeds.items():
+            paginator = KeysetPaginator(queryset, POSTS_IN_PAGE)
+            _, deep = paginator.seek(cursor)
+            for page in (paginator.object_list, deep):
+                with self.subTest(feed=name):
+                    self.assertNotIn(
+                        'USE TEMP B-TREE',
+                        page[:POSTS_IN_PAGE + 1].explain())
+        self.assertNotIn(
+            'USE TEMP B-TREE', self.post.comments.all().explain())
@@ -0,0 +1,141 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+from .. import api_urls, urls
+from ..query_budget import (
+    BUDGETS, CACHE_BUDGETS, QueryBudgetExceeded, query_budget,
+)
+from yatube.settings import POSTS_IN_PAGE
+
+TEST_USERNAME_AUTHOR = 'Author_post'
+TEST_USERNAME_READER = 'Reader'
+TEST_SLUG = 'test_slug'
+# Файла нет на диске: важен только запрос миниатюр для карточек.
+TEST_IMAGE = 'posts/budget.gif'
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=TEST_USERNAME_AUTHOR)
+        cls.reader = User.objects.create_user(username=TEST_USERNAME_READER)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug=TEST_SLUG,
+            description='Тестовое описание',
+        )
+        # Полная страница постов разных авторов и групп с картинками:
+        # N+1 по авторам, группам или миниатюрам сразу выйдет за бюджет.
+        for i in range(POSTS_IN_PAGE):
+            author = User.objects.create_user(username=f'budget_author_{i}')
+            Post.objects.create(
+                author=author,
+                text=f'Пост автора {i}',
+                image=TEST_IMAGE,
+                group=Group.objects.create(
+                    title=f'Группа {i}',
+                    slug=f'budget_group_{i}',
+                    description='Группа для проверки запросов',
+                ),
+            )
+            Follow.objects.create(user=cls.reader, author=author)
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.author, group=cls.group,
+                 image=TEST_IMAGE)
+            for i in range(POSTS_IN_PAGE)
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост', image=TEST_IMAGE)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=author, text='Комментарий')
+            for author in User.objects.exclude(pk=cls.author.pk)[:5]
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def cases(self):
+        post = [self.post.pk]
+        author = [TEST_USERNAME_AUTHOR]
+        readers = (self.guest, self.reader_client)
+        for client in readers:
+            yield client, 'get', 'posts:main_page', [], None
+            yield client, 'get', 'posts:group_posts', [TEST_SLUG], None
+            yield client, 'get', 'posts:profile', author, None
+            yield client, 'get', 'posts:post_detail', post, None
+            yield client, 'get', 'api:index', [], None
+            yield client, 'get', 'api:group_posts', [TEST_SLUG], None
+            yield client, 'get', 'api:profile', author, None
+            yield client, 'get', 'api:post_detail', post, None
+            yield client, 'get', 'posts:search', [], {'q': 'пост'}
+        yield self.reader_client, 'get', 'posts:follow_index', [], None
+        yield self.reader_client, 'get', 'api:follow_index', [], None
+        yield self.reader_client, 'get', 'posts:post_create', [], None
+        yield self.reader_client, 'post', 'posts:post_create', [], {
+            'text': 'Новый пост', 'group': self.group.pk}
+        yield self.author_client, 'get', 'posts:post_edit', post, None
+        yield self.author_client, 'post', 'posts:post_edit', post, {
+            'text': 'Измененный пост', 'group': self.group.pk}
+        yield self.reader_client, 'post', 'posts:add_comment', post, {
+            'text': 'Комментарий'}
+        yield self.reader_client, 'get', 'posts:profile_follow', author, None
+        yield (
+            self.reader_client, 'get', 'posts:profile_unfollow', author, None)
+
+    def test_routes_within_budget(self):
+        """Каждая страница posts и API укладывается в свой бюджет."""
+
+        for client, method, url_name, args, data in self.cases():
+            with self.subTest(url_name=url_name, method=method):
+                cache.clear()
+                url = reverse(url_name, args=args)
+                with query_budget(url_name):
+                    response = getattr(client, method)(url, data)
+                self.assertLess(response.status_code, 400)
+
+    def test_every_route_has_budget(self):
+        routes = {
+            f'{module.app_name}:{pattern.name}'
+            for module in (urls, api_urls)
+            for pattern in module.urlpatterns
+        }
+        self.assertEqual(set(BUDGETS), routes)
+        self.assertEqual(set(CACHE_BUDGETS), routes)
+
+    def test_exceeded_budget_reports_queries(self):
+        """Превышение показывает лишние и повторяющиеся запросы."""
+
+        with self.assertRaises(QueryBudgetExceeded) as error:
+            with query_budget('posts:main_page', budget=1):
+                for post in Post.objects.all()[:3]:
+                    post.author.username
+        message = str(error.exception)
+        self.assertIn('posts:main_page: 4 запросов к базе при бюджете 1',
+                      message)
+        self.assertIn('+ 4. SELECT', message)
+        self.assertIn('3 x SELECT', message)
+
+    def test_cache_queries_have_own_budget(self):
+        """Запросы к таблице кэша считаются по отдельному бюджету."""
+
+        with query_budget('posts:main_page', budget=0) as budget:
+            cache.get('budget_key')
+        self.assertEqual(budget.queries, [])
+        self.assertEqual(len(budget.cache_queries), 1)
+        with self.assertRaises(QueryBudgetExceeded) as error:
+            with query_budget('posts:main_page', cache_budget=0):
+                cache.get('budget_key')
+        self.assertIn('posts:main_page: 1 запросов к кэшу при бюджете 0',
+                      str(error.exception))
+
+    @query_budget('posts:main_page')
+    def test_decorator(self):
+        self.guest.get(reverse('posts:main_page'))
@@ -0,0 +1,187 @@
+from io import StringIO
+from unittest import mock
+from urllib.parse import quote
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import search
+from ..models import Comment, Post, PostSearch, SearchTask, User
+from yatube.settings import POSTS_IN_PAGE
+
+TEST_USERNAME_AUTHOR = 'Author_post'
+SEARCH_URL = reverse('posts:search')
+
+
+def found(query):
+    return list(search.search(query).order_by('rank').values_list(
+        'pk', flat=True))
+
+
+class SearchIndexTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=TEST_USERNAME_AUTHOR)
+        cls.post = Post.objects.create(
+            author=cls.author, text='Рыжий кот спит на солнце')
+        search.process()
+
+    def test_to_match_quotes_words(self):
+        """Операторы и кавычки из запроса не доходят до FTS5."""
+
+        self.assertEqual(
+            search.to_match('Кот OR "собака" NEAR(-ёж)'),
+            '"кот"* "or"* "собака"* "near"* "еж"*')
+        self.assertEqual(search.to_match(' *"- '), '')
+        self.assertEqual(
+            search.to_match('кот', columns=['text']), '{text} : ("кот"*)')
+
+    def test_changes_queued_until_processed(self):
+        """Правки ставятся в очередь и попадают в индекс пачкой."""
+
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Серая собака ёжится'
+        post.save()
+        Comment.objects.create(
+            post=post, author=self.author, text='Собака лает')
+        self.assertEqual(
+            list(SearchTask.objects.values_list('post_id', flat=True)),
+            [post.pk])
+        self.assertEqual(found('кот'), [post.pk])
+        self.assertEqual(search.process(), 1)
+        self.assertFalse(SearchTask.objects.exists())
+        self.assertEqual(found('кот'), [])
+        self.assertEqual(found('ежится'), [post.pk])
+        self.assertEqual(found('лает'), [post.pk])
+        post.delete()
+        search.process()
+        self.assertEqual(found('собака'), [])
+        self.assertFalse(PostSearch.objects.exists())
+
+    def test_unchanged_text_not_queued(self):
+        post = Post.objects.get(pk=self.post.pk)
+        post.save()
+        self.assertFalse(SearchTask.objects.exists())
+
+    def test_post_text_ranks_above_comments(self):
+        commented = Post.objects.create(
+            author=self.author, text='Пост без ключевого слова')
+        Comment.objects.create(
+            post=commented, author=self.author,
+            text='Рыжий кот спит на солнце')
+        best = Post.objects.create(
+            author=self.author, text='Кот и кот: про котов')
+        search.process()
+        self.assertEqual(
+            found('кот'), [best.pk, self.post.pk, commented.pk])
+
+    def test_bulk_created_posts_indexed_later(self):
+        """Посты мимо сигналов добавляет index_missing, rebuild - все."""
+
+        Post.objects.bulk_create([
+            Post(author=self.author, text='Импортированный пост'),
+        ])
+        self.assertEqual(found('импортированный'), [])
+        self.assertEqual(search.index_missing(), 1)
+        self.assertEqual(len(found('импортированный')), 1)
+        PostSearch.objects.filter(pk=self.post.pk).delete()
+        progress = []
+        self.assertEqual(search.rebuild(
+            chunk_size=1, progress=lambda done, rate: progress.append(done)
+        ), 2)
+        self.assertEqual(progress, [1, 2])
+        self.assertEqual(found('кот'), [self.post.pk])
+
+    def test_write_deletes_in_batches(self):
+        """Большая пачка удаляется из индекса запросами по BATCH_SIZE."""
+
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Кот номер {i}') for i in range(4))
+        search.index_missing()
+        post_ids = list(Post.objects.values_list('pk', flat=True))
+        with mock.patch.object(search, 'BATCH_SIZE', 2), \
+                CaptureQueriesContext(connection) as queries:
+            search.write(post_ids, [])
+        deletes = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 3)
+        self.assertEqual(found('кот'), [])
+
+
+class RebuildSearchIndexCommandTests(TransactionTestCase):
+    # Потокам пула нужны закоммиченные данные: TestCase держит их
+    # в открытой транзакции.
+
+    def test_parallel_rebuild(self):
+        author = User.objects.create_user(username=TEST_USERNAME_AUTHOR)
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Пост номер {i}') for i in range(7))
+        stale = Post.objects.create(author=author, text='Удаленный пост')
+        search.process()
+        Post.objects.filter(pk=stale.pk).delete()
+        out = StringIO()
+        call_command(
+            'rebuild_search_index', workers=3, chunk_size=2, stdout=out)
+        self.assertIn('2/7 постов', out.getvalue())
+        self.assertIn('док/с', out.getvalue())
+        self.assertIn('Проиндексировано постов: 7', out.getvalue())
+        self.assertEqual(len(found('номер')), 7)
+        self.assertFalse(PostSearch.objects.filter(pk=stale.pk).exists())
+
+
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=TEST_USERNAME_AUTHOR)
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        for i in range(POSTS_IN_PAGE + 3):
+            Post.objects.create(author=cls.author, text=f'Новость номер {i}')
+        Post.objects.create(author=cls.author, text='Совсем другое')
+        search.process()
+
+    def test_pages_by_cursor(self):
+        """Результаты листаются курсором, запрос сохраняется в ссылках."""
+
+        response = self.client.get(SEARCH_URL, {'q': 'новость'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), POSTS_IN_PAGE)
+        self.assertContains(response, f'?q={quote("новость")}&amp;cursor=')
+        second = self.client.get(SEARCH_URL, {
+            'q': 'новость', 'cursor': page_obj.next_cursor,
+        }).context['page_obj']
+        self.assertEqual(len(second), 3)
+        self.assertFalse(second.has_next())
+        self.assertFalse(
+            {post.pk for post in page_obj} & {post.pk for post in second})
+
+    def test_bad_cursor_gives_first_page(self):
+        response = self.client.get(SEARCH_URL, {
+            'q': 'новость', 'cursor': 'WyJuIixbbnVsbCxudWxsXV0'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_empty_query_and_no_results(self):
+        response = self.client.get(SEARCH_URL)
+        self.assertIsNone(response.context['page_obj'])
+        response = self.client.get(SEARCH_URL, {'q': 'отсутствует'})
+        self.assertContains(response, 'Ничего не найдено')
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идет по индексу, а не LIKE по тексту."""
+
+        client = Client()
+        client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(
+                reverse('admin:posts_post_changelist'), {'q': 'другое'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertIn('MATCH', sql)
+        self.assertNotIn('LIKE', sql)
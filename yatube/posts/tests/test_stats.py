@@ -0,0 +1,59 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Post, User, UserStats
+
+TEST_USERNAME_AUTHOR = 'Author_post'
+TEST_USERNAME_ANOTHER = 'Another'
+
+
+class UserStatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=TEST_USERNAME_AUTHOR)
+        cls.another_user = User.objects.create_user(
+            username=TEST_USERNAME_ANOTHER)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_changes(self):
+        """Счетчики меняются при создании и удалении объектов."""
+
+        post = Post.objects.create(author=self.user, text='Тестовый пост')
+        comment = Comment.objects.create(
+            post=post, author=self.another_user, text='Комментарий')
+        follow = Follow.objects.create(
+            user=self.another_user, author=self.user)
+        author_stats = self.stats(self.user)
+        another_stats = self.stats(self.another_user)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(another_stats.following_count, 1)
+        self.assertEqual(another_stats.comments_count, 1)
+        comment.delete()
+        follow.delete()
+        post.delete()
+        author_stats = self.stats(self.user)
+        another_stats = self.stats(self.another_user)
+        self.assertEqual(author_stats.posts_count, 0)
+        self.assertEqual(author_stats.followers_count, 0)
+        self.assertEqual(another_stats.following_count, 0)
+        self.assertEqual(another_stats.comments_count, 0)
+
+    def test_rebuild_command_restores_counters(self):
+        """Команда rebuild_user_stats пересчитывает счетчики с нуля."""
+
+        post = Post.objects.create(author=self.user, text='Тестовый пост')
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        Follow.objects.create(user=self.another_user, author=self.user)
+        UserStats.objects.all().update(posts_count=100, comments_count=0)
+        call_command('rebuild_user_stats', stdout=StringIO())
+        stats = self.stats(self.user)
+        self.assertEqual(stats.posts_count, 1)
+        self.assertEqual(stats.comments_count, 1)
+        self.assertEqual(stats.followers_count, 1)
+        self.assertEqual(self.stats(self.another_user).following_count, 1)
@@ -0,0 +1,111 @@
+import hashlib
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..models import MediaBlob, Post, User
+from ..signals import delete_blob
+from ..storage import content_storage, is_content_addressed
+
+TEST_IMAGE = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+OTHER_IMAGE = TEST_IMAGE[:-1] + b'\x00\x3B'
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image(content=TEST_IMAGE, name='small.gif'):
+    return SimpleUploadedFile(name, content, 'image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create(self, content=TEST_IMAGE, name='small.gif'):
+        return Post.objects.create(
+            author=self.user, text='Пост', image=image(content, name))
+
+    def test_name_is_content_digest(self):
+        """Имя файла строится по sha256 содержимого."""
+        digest = hashlib.sha256(TEST_IMAGE).hexdigest()
+        post = self.create(name='Cat.GIF')
+        self.assertEqual(
+            post.image.name, f'posts/{digest[:2]}/{digest}.gif')
+        self.assertTrue(is_content_addressed(post.image.name))
+
+    def test_duplicates_share_one_blob(self):
+        """Одинаковые загрузки хранятся одним файлом с общим счетчиком."""
+        first = self.create(name='first.gif')
+        second = self.create(name='second.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            MediaBlob.objects.get(name=first.image.name).references, 2)
+
+    def test_last_reference_releases_blob(self):
+        """Файл освобождается, когда на него не ссылается ни один пост."""
+        first = self.create()
+        second = self.create()
+        name = first.image.name
+        first.delete()
+        self.assertEqual(MediaBlob.objects.get(name=name).references, 1)
+        second.delete()
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+        delete_blob(name)
+        self.assertFalse(content_storage.exists(name))
+
+    def test_replaced_image_releases_old_blob(self):
+        """Замена картинки переносит ссылку на новый файл."""
+        post = self.create()
+        old_name = post.image.name
+        post.image = image(OTHER_IMAGE)
+        post.save()
+        post.save()
+        self.assertFalse(MediaBlob.objects.filter(name=old_name).exists())
+        self.assertEqual(
+            MediaBlob.objects.get(name=post.image.name).references, 1)
+
+    def test_blob_reuploaded_before_commit_kept(self):
+        """Файл, загруженный снова до удаления, остается на диске."""
+        post = self.create()
+        name = post.image.name
+        delete_blob(name)
+        self.assertTrue(content_storage.exists(name))
+
+    def test_dedupe_media_command(self):
+        """Команда переносит старые файлы и склеивает дубликаты."""
+        legacy = [
+            FileSystemStorage().save(name, ContentFile(TEST_IMAGE))
+            for name in ('posts/a.gif', 'posts/b.gif')
+        ]
+        for name in legacy:
+            Post.objects.create(author=self.user, text='Старый', image=name)
+        MediaBlob.objects.all().delete()
+        call_command('dedupe_media', stdout=StringIO())
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertTrue(is_content_addressed(name))
+        self.assertEqual(MediaBlob.objects.get(name=name).references, 2)
+        for old in legacy:
+            self.assertFalse(content_storage.exists(old))
@@ -0,0 +1,182 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.templatetags.static import static
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from sorl.thumbnail.models import KVStore
+
+from .. import thumbnails
+from ..models import Post, ThumbnailTask, User
+
+TEST_IMAGE = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+PLACEHOLDER_URL = static(thumbnails.PLACEHOLDER)
+
+
+def image(name='small.gif'):
+    return SimpleUploadedFile(
+        name=name, content=TEST_IMAGE, content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Author')
+        cls.client_author = Client()
+        cls.client_author.force_login(cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.user, text='Пост с картинкой', image=image())
+        self.detail_url = reverse('posts:post_detail', args=[self.post.pk])
+
+    def refreshed(self):
+        return Post.objects.get(pk=self.post.pk)
+
+    def test_placeholder_until_thumbnail_ready(self):
+        """Пока миниатюры нет, страница показывает заглушку."""
+        self.assertContains(self.client.get(self.detail_url), PLACEHOLDER_URL)
+        thumbnails.generate(self.post.pk)
+        response = self.client.get(self.detail_url)
+        self.assertNotContains(response, PLACEHOLDER_URL)
+        self.assertContains(
+            response, thumbnails.picture(self.refreshed(), 'card').url)
+
+    def test_generate_refreshes_post_cards(self):
+        """Готовая миниатюра меняет версию карточки поста в лентах."""
+        self.assertContains(self.client.get(reverse('posts:main_page')),
+                            PLACEHOLDER_URL)
+        thumbnails.generate(self.post.pk)
+        self.assertNotContains(self.client.get(reverse('posts:main_page')),
+                               PLACEHOLDER_URL)
+
+    def test_responsive_variants_next_to_original(self):
+        """Варианты всех ширин лежат рядом с исходником и идут в srcset."""
+        buffer = BytesIO()
+        Image.new('RGB', (1600, 1200), 'red').save(buffer, 'JPEG')
+        post = Post.objects.create(
+            author=self.user, text='Большая картинка',
+            image=SimpleUploadedFile('big.jpg', buffer.getvalue()))
+        thumbnails.generate(post.pk)
+        post = Post.objects.get(pk=post.pk)
+        thumbnails.prefetch([post])
+        root, _ = os.path.splitext(post.image.name)
+        for thumbnail in post.prefetched_thumbnails.values():
+            with self.subTest(thumbnail=thumbnail.name):
+                self.assertTrue(thumbnail.name.startswith(root + '.'))
+                self.assertTrue(thumbnail.exists())
+        picture = thumbnails.picture(post, 'card')
+        self.assertEqual((picture.width, picture.height), (600, 400))
+        widths = [
+            int(candidate.split()[-1][:-1])
+            for candidate in picture.srcset.split(', ')
+        ]
+        self.assertEqual(widths, list(thumbnails.RESPONSIVE['card']['widths']))
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.pk]))
+        self.assertContains(response, f'srcset="{picture.srcset}"')
+
+    @skipUnless('WEBP' in thumbnails.FORMATS, 'Pillow собран без WebP')
+    def test_webp_source(self):
+        """При поддержке WebP страница предлагает его через <source>."""
+        thumbnails.generate(self.post.pk)
+        self.assertContains(
+            self.client.get(self.detail_url), 'type="image/webp"')
+
+    def test_feed_reads_thumbnails_in_one_query(self):
+        """Миниатюры страницы ленты читаются из хранилища одной пачкой."""
+        for index in range(3):
+            buffer = BytesIO()
+            Image.new('RGB', (8, 8), (index * 50, 0, 0)).save(buffer, 'PNG')
+            post = Post.objects.create(
+                author=self.user, text=f'Пост {index}',
+                image=SimpleUploadedFile(f'{index}.png', buffer.getvalue()))
+            thumbnails.generate(post.pk)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:main_page'))
+        kvstore_queries = [
+            query for query in queries.captured_queries
+            if KVStore._meta.db_table in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        self.assertContains(response, PLACEHOLDER_URL, count=1)
+
+    def test_generate_skips_missing_source(self):
+        """Без исходника пост не помечается измененным."""
+        self.post.image.delete(save=False)
+        Post.objects.filter(pk=self.post.pk).update(image='posts/none.gif')
+        updated = Post.objects.get(pk=self.post.pk).updated
+        with self.assertLogs('sorl.thumbnail.base', 'ERROR'):
+            thumbnails.generate(self.post.pk)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).updated, updated)
+
+    def test_create_and_edit_queue_thumbnails(self):
+        """Создание поста и смена картинки ставят пост в очередь."""
+        self.client_author.post(reverse('posts:post_create'), {
+            'text': 'Новый пост', 'image': image('new.gif')})
+        new_post = Post.objects.get(text='Новый пост')
+        self.assertTrue(
+            ThumbnailTask.objects.filter(post=new_post).exists())
+        edit_url = reverse('posts:post_edit', args=[self.post.pk])
+        self.client_author.post(edit_url, {'text': 'Только текст'})
+        self.assertFalse(
+            ThumbnailTask.objects.filter(post=self.post).exists())
+        self.client_author.post(edit_url, {
+            'text': 'Новая картинка', 'image': image('other.gif')})
+        self.assertTrue(
+            ThumbnailTask.objects.filter(post=self.post).exists())
+
+    def test_process_thumbnails_command(self):
+        """Воркер разбирает очередь и создает миниатюры."""
+        thumbnails.schedule(self.post)
+        call_command('process_thumbnails', once=True, workers=1,
+                     stdout=StringIO())
+        self.assertFalse(ThumbnailTask.objects.exists())
+        self.assertTrue(thumbnails.is_ready(self.refreshed()))
+
+    def test_task_requeued_during_processing_kept(self):
+        """Повторная постановка во время обработки не теряется."""
+        thumbnails.schedule(self.post)
+
+        def requeue(post_id):
+            ThumbnailTask.objects.filter(post_id=post_id).update(
+                queued=timezone.now() + timedelta(seconds=1))
+
+        with mock.patch.object(thumbnails, 'generate', requeue):
+            thumbnails.process(batch_size=10)
+        self.assertTrue(ThumbnailTask.objects.filter(post=self.post).exists())
+
+    def test_schedule_missing(self):
+        """Посты без готовых миниатюр ставятся в очередь."""
+        self.assertEqual(thumbnails.schedule_missing(), 1)
+        thumbnails.process(batch_size=10)
+        self.assertEqual(thumbnails.schedule_missing(), 0)
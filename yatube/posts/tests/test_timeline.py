@@ -0,0 +1,155 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry, TimelineHorizon, User
+
+TEST_USERNAME_AUTHOR = 'Author_post'
+TEST_USERNAME_FOLLOWER = 'Follower'
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=TEST_USERNAME_AUTHOR)
+        cls.follower = User.objects.create_user(
+            username=TEST_USERNAME_FOLLOWER)
+
+    def test_new_post_pushed_to_followers(self):
+        """Новый пост попадает в ящик подписчика и в его ленту."""
+
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=post).exists())
+        self.assertEqual(list(timeline.feed(self.follower)), [post])
+
+    def test_follow_backfills_and_unfollow_forgets(self):
+        """Подписка добавляет старые посты автора, отписка убирает их."""
+
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        follow = Follow.objects.create(user=self.follower, author=self.author)
+        self.assertEqual(list(timeline.feed(self.follower)), [post])
+        follow.delete()
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(list(timeline.feed(self.follower)), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_celebrity_posts_read_on_demand(self):
+        """Посты популярных авторов не раскладываются, но видны в ленте."""
+
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(list(timeline.feed(self.follower)), [post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_back_under_limit_restored(self):
+        """Посты, вышедшие без раскладки, остаются в ленте после отписки."""
+
+        other = User.objects.create_user(username='Other')
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        self.assertFalse(TimelineEntry.objects.exists())
+        Follow.objects.filter(user=other).delete()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=post).exists())
+        self.assertEqual(list(timeline.feed(self.follower)), [post])
+        self.assertEqual(
+            list(timeline.paginator(self.follower, 10).page()), [post])
+
+    @override_settings(TIMELINE_SIZE=500)
+    def test_fan_out_trims_sample_of_followers(self):
+        """Новый пост не пересчитывает ящики всех подписчиков."""
+
+        Follow.objects.create(user=self.follower, author=self.author)
+        with mock.patch('random.random', return_value=0.5):
+            with mock.patch.object(timeline, 'trim') as trim:
+                Post.objects.create(author=self.author, text='Тестовый пост')
+        trim.assert_called_once_with([])
+
+    @override_settings(TIMELINE_SIZE=4)
+    def test_trimmed_inbox_falls_back_to_follows(self):
+        """Посты старше подрезанного ящика дочитываются из подписок."""
+
+        Follow.objects.create(user=self.follower, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(10)
+        ]
+        self.assertLessEqual(
+            TimelineEntry.objects.filter(user=self.follower).count(), 5)
+        self.assertEqual(
+            list(timeline.feed(self.follower).order_by('-pub_date')),
+            posts[::-1]
+        )
+
+    @override_settings(TIMELINE_SIZE=4)
+    def test_unfollow_keeps_older_posts_of_others(self):
+        """Отписка от одного автора не прячет посты остальных."""
+
+        other = User.objects.create_user(username='Other')
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(4)
+        ]
+        for i in range(6):
+            Post.objects.create(author=other, text=f'Другой {i}')
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.follower, author=other)
+        self.assertTrue(TimelineHorizon.objects.filter(
+            user=self.follower).exists())
+        Follow.objects.filter(user=self.follower, author=other).delete()
+        self.assertEqual(
+            list(timeline.feed(self.follower).order_by('-pub_date')),
+            posts[::-1]
+        )
+        page = timeline.paginator(self.follower, 10).page()
+        self.assertEqual(list(page), posts[::-1])
+
+    @override_settings(TIMELINE_SIZE=4)
+    def test_pages_cross_horizon(self):
+        """Курсор переходит из ящика в подписки и обратно."""
+
+        Follow.objects.create(user=self.follower, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(10)
+        ][::-1]
+        paginator = timeline.paginator(self.follower, 3)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        self.assertEqual(
+            [list(page) for page in pages],
+            [posts[:3], posts[3:6], posts[6:9], posts[9:]])
+        self.assertEqual(
+            list(paginator.page(pages[-1].previous_cursor)), posts[6:9])
+        self.assertEqual(
+            list(paginator.page(pages[2].previous_cursor)), posts[3:6])
+        self.assertEqual(paginator.count, 10)
+
+    def test_inbox_page_does_not_read_follows(self):
+        """Страница внутри ящика читается без подзапроса по подпискам."""
+
+        Follow.objects.create(user=self.follower, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(3)
+        ]
+        TimelineHorizon.objects.create(
+            user=self.follower, pub_date=posts[0].pub_date)
+        with CaptureQueriesContext(connection) as queries:
+            page = timeline.paginator(self.follower, 1).page()
+        self.assertEqual(list(page), [posts[-1]])
+        post_queries = [
+            query['sql'] for query in queries.captured_queries
+            if 'FROM "posts_post"' in query['sql']
+        ]
+        self.assertEqual(len(post_queries), 1)
+        self.assertNotIn('posts_follow', post_queries[0])
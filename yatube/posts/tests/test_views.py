@@ -1,5 +1,8 @@
+import base64
+import json
 import tempfile
 import shutil
+from unittest import mock
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -7,7 +10,8 @@ from django.core.cache import cache
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 
-from ..models import Group, Post, User, Follow
+from ..models import Comment, Group, Post, User, Follow
+from ..paginators import NEXT, PREVIOUS
 from yatube.settings import POSTS_IN_PAGE
 
 
@@ -35,6 +39,12 @@ FOLLOW_URL = reverse('posts:profile_follow', args=[TEST_USERNAME_AUTHOR])
 UNFOLLOW_URL = reverse('posts:profile_unfollow', args=[TEST_USERNAME_AUTHOR])
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+# Обращения к кэшу в базе не должны попадать в подсчет запросов страниц.
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -157,34 +167,195 @@ class PostViewTests(TestCase):
             user=self.user_another,
             author=self.user
         )
-        pages = {
-            INDEX_URL: POSTS_IN_PAGE,
-            PROFILE_URL: POSTS_IN_PAGE,
-            GROUP_LIST_URL: POSTS_IN_PAGE,
-            FOLLOW_INDEX_URL: POSTS_IN_PAGE,
-            INDEX_URL + '?page=2': posts_in_second_page,
-            PROFILE_URL + '?page=2': posts_in_second_page,
-            GROUP_LIST_URL + '?page=2': posts_in_second_page,
-            FOLLOW_INDEX_URL + '?page=2': posts_in_second_page,
-        }
-        for url, amount_posts in pages.items():
+        for url in [INDEX_URL, PROFILE_URL, GROUP_LIST_URL, FOLLOW_INDEX_URL]:
             with self.subTest(url=url):
-                self.assertEqual(
-                    len(self.another_client.get(url).context['page_obj']),
-                    amount_posts)
+                cache.clear()
+                first_page = self.another_client.get(url).context['page_obj']
+                self.assertEqual(len(first_page), POSTS_IN_PAGE)
+                self.assertFalse(first_page.has_previous())
+                second_page = self.another_client.get(
+                    url, {'cursor': first_page.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(len(second_page), posts_in_second_page)
+                self.assertFalse(second_page.has_next())
+                self.assertNotIn(second_page[0], list(first_page))
+                previous_page = self.another_client.get(
+                    url, {'cursor': second_page.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(previous_page), list(first_page))
+
+    def test_paginator_approximate_total(self):
+        """Число записей считается до границы и тогда показывается с «+»"""
+
+        Post.objects.bulk_create(
+            Post(text=f'Тестовый пост {i}', author=self.user)
+            for i in range(POSTS_IN_PAGE)
+        )
+        total = Post.objects.count()
+        cache.clear()
+        self.assertContains(self.client.get(INDEX_URL), f'Записей: {total}\n')
+        with override_settings(POSTS_COUNT_LIMIT=5):
+            cache.clear()
+            self.assertContains(self.client.get(INDEX_URL), 'Записей: 5+')
+
+    def test_paginator_invalid_cursor(self):
+        """Некорректный курсор возвращает первую страницу"""
+
+        crafted = [
+            [NEXT, [None, None]],
+            [NEXT, [1, 2]],
+            [NEXT, [True, 1]],
+            [NEXT, [['2020-01-01'], {}]],
+            [PREVIOUS, ['2020-01-01T00:00:00', 'не-число']],
+        ]
+        cursors = ['не-курсор'] + [
+            base64.urlsafe_b64encode(json.dumps(raw).encode()).decode()
+            for raw in crafted
+        ]
+        for url in [INDEX_URL, GROUP_LIST_URL]:
+            for cursor in cursors:
+                with self.subTest(url=url, cursor=cursor):
+                    response = self.another_client.get(url, {'cursor': cursor})
+                    self.assertEqual(
+                        list(response.context['page_obj']), [self.post])
+
+    def test_paginator_exhausted_cursor(self):
+        """Курсор на удаленный хвост ленты возвращает первую страницу"""
+
+        Post.objects.bulk_create(
+            Post(text=f'Тестовый пост {i}', author=self.user, group=self.group)
+            for i in range(POSTS_IN_PAGE)
+        )
+        first_page = self.another_client.get(
+            GROUP_LIST_URL).context['page_obj']
+        Post.objects.filter(
+            pk__in=Post.objects.order_by('pub_date', 'pk').values_list(
+                'pk', flat=True)[:1]
+        ).delete()
+        cache.clear()
+        response = self.another_client.get(
+            GROUP_LIST_URL, {'cursor': first_page.next_cursor})
+        self.assertEqual(response.status_code, 200)
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), POSTS_IN_PAGE)
+        self.assertFalse(page_obj.has_previous())
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_feed_pages_query_count(self):
+        """Число запросов ленты не зависит от числа постов на странице"""
+
+        for i in range(POSTS_IN_PAGE):
+            author = User.objects.create_user(username=f'feed_author_{i}')
+            Post.objects.create(
+                author=author,
+                text=f'Пост автора {i}',
+                group=Group.objects.create(
+                    title=f'Группа {i}',
+                    slug=f'feed_group_{i}',
+                    description='Группа для проверки запросов',
+                ),
+            )
+            Follow.objects.create(user=self.user_another, author=author)
+        author_posts = [
+            Post(text=f'Пост {i}', author=self.user, group=self.group)
+            for i in range(POSTS_IN_PAGE)
+        ]
+        Post.objects.bulk_create(author_posts)
+        cases = [
+            [INDEX_URL, 2],
+            [GROUP_LIST_URL, 3],
+            [PROFILE_URL, 3],
+            [FOLLOW_INDEX_URL, 4],
+        ]
+        for url, queries in cases:
+            with self.subTest(url=url):
+                cache.clear()
+                client = (
+                    self.another_client if url == FOLLOW_INDEX_URL
+                    else Client()
+                )
+                with self.assertNumQueries(queries):
+                    client.get(url)
 
     def test_cache_index(self):
         """Тестирование кэша для main_page."""
 
-        response = self.author_post_client.get(INDEX_URL)
-        first_get_content = response.content
-        response.context['page_obj'][0].delete()
+        first_get_content = self.author_post_client.get(INDEX_URL).content
+        Post.objects.filter(pk=self.post.pk).update(text='Обновленный текст')
         second_get_content = self.author_post_client.get(INDEX_URL).content
         self.assertEqual(first_get_content, second_get_content)
         cache.clear()
         third_get_content = self.author_post_client.get(INDEX_URL).content
         self.assertNotEqual(third_get_content, second_get_content)
 
+    def test_cache_index_invalidated_by_posts(self):
+        """Кэш main_page сбрасывается при создании и удалении поста."""
+
+        first_get_content = self.author_post_client.get(INDEX_URL).content
+        post = Post.objects.create(author=self.user, text='Свежий пост')
+        second_get_content = self.author_post_client.get(INDEX_URL).content
+        self.assertNotEqual(first_get_content, second_get_content)
+        self.assertIn(post.text.encode(), second_get_content)
+        post.delete()
+        third_get_content = self.author_post_client.get(INDEX_URL).content
+        self.assertNotIn(post.text.encode(), third_get_content)
+
+    def test_cache_serves_stale_page_while_rebuilding(self):
+        """Пока страницу пересобирает другой запрос, отдается прежняя."""
+
+        first_get_content = self.author_post_client.get(INDEX_URL).content
+        Post.objects.create(author=self.user, text='Свежий пост')
+        with mock.patch.object(cache, 'add', return_value=False):
+            second_get_content = self.author_post_client.get(
+                INDEX_URL).content
+        self.assertEqual(first_get_content, second_get_content)
+        self.assertNotEqual(
+            first_get_content,
+            self.author_post_client.get(INDEX_URL).content
+        )
+
+    def test_cache_group_and_profile_invalidated(self):
+        """Кэш группы и профиля живет до изменения их данных."""
+
+        group_content = self.author_post_client.get(GROUP_LIST_URL).content
+        profile_content = self.author_post_client.get(PROFILE_URL).content
+        Post.objects.filter(pk=self.post.pk).update(text='Обновленный текст')
+        self.assertEqual(
+            group_content,
+            self.author_post_client.get(GROUP_LIST_URL).content
+        )
+        self.assertEqual(
+            profile_content,
+            self.author_post_client.get(PROFILE_URL).content
+        )
+        Post.objects.create(
+            author=self.user_another, text='Пост в группе', group=self.group)
+        self.assertNotEqual(
+            group_content,
+            self.author_post_client.get(GROUP_LIST_URL).content
+        )
+        Comment.objects.create(
+            post=self.post, author=self.user, text=TEST_COMMENT)
+        self.assertNotEqual(
+            profile_content,
+            self.author_post_client.get(PROFILE_URL).content
+        )
+
+    def test_post_cards_cached_across_feeds(self):
+        """Карточка поста рисуется один раз и обновляется после правки."""
+
+        template = 'posts/includes/posts_page.html'
+        response = self.author_post_client.get(INDEX_URL)
+        self.assertTemplateUsed(response, template)
+        response = self.another_client.get(INDEX_URL)
+        self.assertTemplateNotUsed(response, template)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Отредактированный пост'
+        post.save()
+        response = self.another_client.get(INDEX_URL)
+        self.assertTemplateUsed(response, template)
+        self.assertContains(response, 'Отредактированный пост')
+
     def test_follow_user(self):
         """Тестирование подписки на пользователя"""
 
@@ -0,0 +1,264 @@
+import logging
+import os
+from functools import partial
+
+from django.templatetags.static import static
+from django.utils import timezone
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import serialize, tokey
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDbKVStore)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .cache import invalidate_feeds
+from .models import Post, ThumbnailTask
+from .signals import post_feeds
+from .utils import in_pool_thread
+
+logger = logging.getLogger(__name__)
+
+# Адаптивные картинки: основной размер, ширины вариантов и подсказка
+# sizes для srcset. Каждый вариант создается во всех форматах FORMATS.
+RESPONSIVE = {
+    'card': {
+        'size': (600, 400),
+        'widths': (300, 600, 1200),
+        'sizes': '(max-width: 600px) 100vw, 600px',
+    },
+}
+MAIN_FORMAT = 'JPEG'
+# WebP пишется, только если Pillow собран с libwebp.
+FORMATS = {
+    name: mime for name, mime in (
+        (MAIN_FORMAT, 'image/jpeg'),
+        ('WEBP', 'image/webp'),
+    )
+    if name == MAIN_FORMAT or features.check(name.lower())
+}
+PLACEHOLDER = 'img/thumbnail_placeholder.svg'
+
+
+def _variants():
+    variants = {}
+    for preset, conf in RESPONSIVE.items():
+        width, height = conf['size']
+        for image_format in FORMATS:
+            for variant_width in conf['widths']:
+                geometry = f'{variant_width}x{variant_width * height // width}'
+                # Увеличивается только основной размер, чтобы разметка
+                # не зависела от исходника; крупные варианты не раздуваются.
+                variants[preset, variant_width, image_format] = (geometry, {
+                    'crop': 'center',
+                    'upscale': variant_width == width,
+                    'format': image_format,
+                })
+    return variants
+
+
+# Все создаваемые миниатюры: (пресет, ширина, формат) -> (геометрия, опции).
+PRESETS = _variants()
+
+
+class Picture:
+    """Картинка для шаблона: основной вариант и srcset по форматам."""
+
+    def __init__(self, preset, url, width, height, srcsets=None):
+        self.url = url
+        self.width = width
+        self.height = height
+        self.sizes = RESPONSIVE[preset]['sizes']
+        srcsets = srcsets or {}
+        self.srcset = srcsets.get(MAIN_FORMAT, '')
+        self.sources = [
+            {'type': FORMATS[image_format], 'srcset': srcset}
+            for image_format, srcset in srcsets.items()
+            if image_format != MAIN_FORMAT
+        ]
+
+
+class PresetBackend(ThumbnailBackend):
+    """Бэкенд sorl, умеющий искать готовую миниатюру без генерации.
+
+    Миниатюры лежат рядом с исходником: ``posts/cat.jpg`` получает
+    ``posts/cat.600x400.<хэш опций>.webp`` и так далее.
+    """
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        key = tokey(source.key, geometry_string, serialize(options))
+        root, _ = os.path.splitext(source.name)
+        extension = EXTENSIONS[options['format']]
+        return f'{root}.{geometry_string}.{key[:8]}.{extension}'
+
+    def thumbnail_name(self, source, geometry, options):
+        # Те же умолчания, что подставляет get_thumbnail: иначе имя
+        # не совпадет с именем уже созданного файла.
+        options = dict(options)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return self._get_thumbnail_filename(source, geometry, options)
+
+    def kvstore_key(self, file_, geometry, options):
+        """Ключ записи о миниатюре в хранилище ключ-значение sorl."""
+        name = self.thumbnail_name(ImageFile(file_), geometry, options)
+        return add_prefix(ImageFile(name, default.storage).key)
+
+
+backend = PresetBackend()
+
+
+def _get_many_raw(keys):
+    """Читает записи sorl пачкой: один запрос к кэшу и один к базе.
+
+    Штатный KVStore читает каждую запись отдельно, поэтому пачкой
+    умеем читать только его хранилище cached_db, остальные по одной.
+    """
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDbKVStore):
+        return {key: kvstore._get_raw(key) for key in keys}
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(KVStoreModel.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        # Как и sorl, запоминаем в кэше и отсутствие записи.
+        fresh = {key: found.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(fresh, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fresh)
+    return {
+        key: None if value == EMPTY_VALUE else value
+        for key, value in values.items()
+    }
+
+
+def _image_file(value):
+    return deserialize_image_file(value) if value else None
+
+
+def prefetch(posts):
+    """Находит готовые миниатюры всех вариантов для постов одним чтением.
+
+    Результат кладется в ``post.prefetched_thumbnails``, и тег
+    post_thumbnail уже не обращается к хранилищу за каждым постом.
+    """
+    posts = [post for post in posts if post.image]
+    keys = {
+        (post.pk, variant): backend.kvstore_key(post.image, *PRESETS[variant])
+        for post in posts for variant in PRESETS
+    }
+    values = _get_many_raw(set(keys.values()))
+    for post in posts:
+        post.prefetched_thumbnails = {
+            variant: _image_file(values.get(keys[post.pk, variant]))
+            for variant in PRESETS
+        }
+
+
+def is_ready(post):
+    """Готовы ли все варианты миниатюр поста."""
+    if not hasattr(post, 'prefetched_thumbnails'):
+        prefetch([post])
+    return all(post.prefetched_thumbnails.values())
+
+
+def placeholder(preset):
+    width, height = RESPONSIVE[preset]['size']
+    return Picture(preset, static(PLACEHOLDER), width, height)
+
+
+def picture(post, preset):
+    """Картинка поста для шаблона или заглушка, пока миниатюры нет."""
+    if not hasattr(post, 'prefetched_thumbnails'):
+        prefetch([post])
+    found = post.prefetched_thumbnails
+    main = found[preset, RESPONSIVE[preset]['size'][0], MAIN_FORMAT]
+    if main is None:
+        return placeholder(preset)
+    srcsets = {}
+    for (name, _, image_format), thumbnail in found.items():
+        if name == preset and thumbnail:
+            # Мелкий исходник дает одинаковые ширины у разных вариантов.
+            srcsets.setdefault(image_format, {}).setdefault(
+                thumbnail.width, thumbnail.url)
+    return Picture(preset, main.url, main.width, main.height, {
+        image_format: ', '.join(
+            f'{url} {width}w' for width, url in sorted(widths.items()))
+        for image_format, widths in srcsets.items()
+    })
+
+
+def schedule(post):
+    """Ставит пост в очередь на миниатюры.
+
+    Задача пишется в той же транзакции, что и пост, поэтому воркер
+    увидит ее только вместе с сохраненной картинкой. Повторно
+    загруженная картинка уже имеет миниатюры и в очередь не попадает.
+    """
+    if post.image and not is_ready(post):
+        ThumbnailTask.objects.update_or_create(
+            post_id=post.pk, defaults={'queued': timezone.now()})
+
+
+def schedule_missing():
+    """Ставит в очередь посты, для которых миниатюр еще нет."""
+    queued = 0
+    posts = Post.objects.exclude(image='').exclude(image=None).only('image')
+    for post in posts.iterator():
+        if not is_ready(post):
+            schedule(post)
+            queued += 1
+    return queued
+
+
+def generate(post_id):
+    """Создает миниатюры всех размеров и сбрасывает карточки поста."""
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=post_id).first()
+    if post is None or not post.image:
+        return
+    for geometry, options in PRESETS.values():
+        backend.get_thumbnail(post.image, geometry, **options)
+    if not is_ready(post):
+        # Исходник не прочитался: sorl уже записал причину в лог.
+        return
+    # Новая отметка изменения меняет ключ карточки поста в кэше.
+    Post.objects.filter(pk=post.pk).update(updated=timezone.now())
+    invalidate_feeds(*post_feeds(post))
+
+
+def _generate(post_id):
+    try:
+        generate(post_id)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры поста %s', post_id)
+
+
+def process(batch_size, pool=None):
+    """Обрабатывает пачку задач из очереди, возвращает их число.
+
+    Задачи удаляются с проверкой времени постановки: пост, картинку
+    которого заменили во время обработки, останется в очереди.
+    """
+    tasks = list(ThumbnailTask.objects.order_by('queued').values_list(
+        'post_id', 'queued')[:batch_size])
+    if pool is None:
+        for post_id, _ in tasks:
+            _generate(post_id)
+    else:
+        list(pool.map(
+            partial(in_pool_thread, _generate),
+            [post_id for post_id, _ in tasks]))
+    for post_id, queued in tasks:
+        ThumbnailTask.objects.filter(post_id=post_id, queued=queued).delete()
+    return len(tasks)
@@ -0,0 +1,284 @@
+import random
+
+from django.conf import settings
+from django.db.models import Count, Exists, F, Q, Subquery
+from django.utils.functional import cached_property
+
+from .models import (
+    Follow, Post, TimelineEntry, TimelineHorizon, User, UserStats,
+)
+from .paginators import NEXT, KeysetPaginator
+
+BATCH_SIZE = 500
+# Ящик подрезается не после каждого поста, а при переполнении на четверть.
+# После нового поста проверяется лишь выборка подписчиков: в среднем
+# ящик проверяется раз за TIMELINE_SIZE / TRIM_SLACK новых записей.
+TRIM_SLACK = 4
+# Ключ сортировки ленты подписок. Для постов из ящика это колонки ящика,
+# и страница читается по индексу (user, -pub_date, -post) без сортировки.
+FEED_ORDERING = ('-feed_date', '-feed_post')
+
+
+def is_celebrity(author_id):
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists()
+
+
+def follow_feed(user_id):
+    """Имя версии ленты подписок пользователя в кэше лент."""
+    return f'follow:{user_id}'
+
+
+def follower_feeds(author_id):
+    """Ленты подписок, в которые посты автора попадают через ящики.
+
+    Подписчиков популярного автора не перебираем: их ленты учитывают
+    версию ленты самого автора, см. freshness_feeds().
+    """
+    return [
+        follow_feed(user_id) for user_id in Follow.objects.filter(
+            author_id=author_id,
+        ).exclude(
+            author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+        ).values_list('user_id', flat=True)
+    ]
+
+
+def freshness_feeds(user):
+    """Ленты, версии которых вместе задают свежесть ленты подписок."""
+    return [follow_feed(user.pk)] + [
+        f'author:{username}' for username in Follow.objects.filter(
+            user=user,
+            author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+        ).values_list('author__username', flat=True)
+    ]
+
+
+def fan_out(post):
+    """Кладет новый пост в ящики подписчиков автора."""
+    if not settings.TIMELINE_FANOUT or is_celebrity(post.author_id):
+        return
+    followers = list(
+        Follow.objects.filter(
+            author_id=post.author_id).values_list('user_id', flat=True)
+    )
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers
+        ),
+        ignore_conflicts=True,
+    )
+    chance = TRIM_SLACK / settings.TIMELINE_SIZE
+    trim([user_id for user_id in followers if random.random() < chance])
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ящик подписчика последние посты нового автора."""
+    if not settings.TIMELINE_FANOUT or is_celebrity(author_id):
+        return
+    posts = list(Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date')[:settings.TIMELINE_SIZE + 1])
+    if len(posts) > settings.TIMELINE_SIZE:
+        # Остальные посты автора не старше первого не вошедшего.
+        raise_horizon(user_id, posts.pop()[1])
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts
+        ),
+        ignore_conflicts=True,
+    )
+    trim([user_id])
+
+
+def raise_horizons(user_ids, pub_date):
+    """Сдвигает границы полноты ящиков к более новой дате."""
+    TimelineHorizon.objects.filter(
+        user_id__in=user_ids, pub_date__lt=pub_date).update(pub_date=pub_date)
+    TimelineHorizon.objects.bulk_create(
+        (
+            TimelineHorizon(user_id=user_id, pub_date=pub_date)
+            for user_id in user_ids
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def raise_horizon(user_id, pub_date):
+    raise_horizons([user_id], pub_date)
+
+
+def restore(author_id):
+    """Раскладывает посты автора, опустившегося до предела подписчиков.
+
+    Пока подписчиков было больше TIMELINE_FANOUT_LIMIT, посты автора
+    в ящики не попадали и читались из подписок. Теперь его последние
+    посты кладутся в ящики всех подписчиков, а более старые остаются
+    за их границами. Возвращает подписчиков, чьи ящики изменились.
+    """
+    if not settings.TIMELINE_FANOUT or not UserStats.objects.filter(
+            user_id=author_id,
+            followers_count=settings.TIMELINE_FANOUT_LIMIT).exists():
+        return []
+    followers = list(Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True))
+    posts = list(Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date')[:settings.TIMELINE_SIZE + 1])
+    if len(posts) > settings.TIMELINE_SIZE:
+        raise_horizons(followers, posts.pop()[1])
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for user_id in followers
+            for pk, pub_date in posts
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    trim(followers)
+    return followers
+
+
+def forget(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def trim(user_ids):
+    limit = settings.TIMELINE_SIZE + settings.TIMELINE_SIZE // TRIM_SLACK
+    overflowed = TimelineEntry.objects.filter(
+        user_id__in=user_ids
+    ).values('user_id').annotate(total=Count('pk')).filter(total__gt=limit)
+    for row in overflowed:
+        stale = list(TimelineEntry.objects.filter(
+            user_id=row['user_id']
+        ).order_by('-pub_date', '-post').values_list(
+            'pk', 'pub_date')[settings.TIMELINE_SIZE:])
+        raise_horizon(row['user_id'], stale[0][1])
+        TimelineEntry.objects.filter(
+            pk__in=[pk for pk, _ in stale]).delete()
+
+
+def rebuild(user_ids=None):
+    """Заполняет ящики заново по текущим подпискам."""
+    entries = TimelineEntry.objects.all()
+    horizons = TimelineHorizon.objects.all()
+    follows = Follow.objects.values_list('user_id', 'author_id')
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+        horizons = horizons.filter(user_id__in=user_ids)
+        follows = follows.filter(user_id__in=user_ids)
+    entries.delete()
+    horizons.delete()
+    for user_id, author_id in follows.iterator(chunk_size=BATCH_SIZE):
+        backfill(user_id, author_id)
+
+
+def _celebrities(user):
+    """Авторы среди подписок пользователя, для которых нет раскладки."""
+    return Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values('author')
+
+
+def _state(user):
+    """Граница ящика и есть ли подписки без раскладки - одним запросом."""
+    return User.objects.filter(pk=user.pk).annotate(
+        has_celebrities=Exists(_celebrities(user)),
+    ).values_list('timeline_horizon__pub_date', 'has_celebrities').get()
+
+
+def feed(user):
+    """Все посты ленты подписок без порядка страниц.
+
+    Посты новее границы ящика берутся из ящика, не новее и посты
+    авторов без раскладки - из подписок. Страницы ленты читает
+    paginator().
+    """
+    following = Follow.objects.filter(user=user).values('author')
+    if not settings.TIMELINE_FANOUT:
+        return Post.objects.filter(author__in=following)
+    horizon = TimelineHorizon.objects.filter(user=user).values('pub_date')
+    return Post.objects.filter(
+        Q(pk__in=TimelineEntry.objects.filter(user=user).values('post'))
+        | Q(author__in=_celebrities(user))
+        | Q(author__in=following, pub_date__lte=Subquery(horizon))
+    )
+
+
+class TimelinePaginator(KeysetPaginator):
+    """Страницы ленты подписок из двух частей, разделенных горизонтом.
+
+    Посты новее горизонта читаются из ящика, не новее - из подписок.
+    Ключ сортировки у частей общий, поэтому курсор одной части
+    продолжается в другой, а подписки читаются, только когда страница
+    дошла до горизонта.
+    """
+
+    def __init__(self, newer, older, horizon, per_page, count_limit=None):
+        super().__init__(
+            newer.filter(feed_date__gt=horizon), per_page,
+            ordering=FEED_ORDERING, count_limit=count_limit)
+        self.older = older.filter(
+            feed_date__lte=horizon).order_by(*FEED_ORDERING)
+        self.horizon = horizon
+
+    @cached_property
+    def count(self):
+        total = self.object_list[:self.count_limit].count()
+        if self.count_limit is None:
+            return total + self.older.count()
+        if total < self.count_limit:
+            total += self.older[:self.count_limit - total].count()
+        return total
+
+    def fetch(self, direction, values, limit):
+        forward = direction == NEXT
+        parts = [self.object_list, self.older]
+        if not forward:
+            parts.reverse()
+        if values is not None:
+            # До части, в которой лежит курсор, строк нет.
+            in_older = values[0] <= self.horizon
+            parts = parts[int(in_older == forward):]
+        rows = []
+        for part in parts:
+            rows += list(
+                self._after(part, direction, values)[:limit - len(rows)])
+            if len(rows) >= limit:
+                break
+            # Вся следующая часть лежит за курсором.
+            values = None
+        return rows
+
+
+def paginator(user, per_page, count_limit=None):
+    """Пагинатор ленты подписок пользователя."""
+    posts = Post.objects.for_feed()
+    following = Follow.objects.filter(user=user).values('author')
+    by_post = {'feed_date': F('pub_date'), 'feed_post': F('pk')}
+    if not settings.TIMELINE_FANOUT:
+        return KeysetPaginator(
+            posts.filter(author__in=following).annotate(**by_post),
+            per_page, ordering=FEED_ORDERING, count_limit=count_limit)
+    horizon, has_celebrities = _state(user)
+    if has_celebrities:
+        # Посты без раскладки смешиваются с ящиком сортировкой постов.
+        newer = posts.filter(
+            Q(pk__in=TimelineEntry.objects.filter(user=user).values('post'))
+            | Q(author__in=_celebrities(user))
+        ).annotate(**by_post)
+    else:
+        newer = posts.filter(timeline_entries__user=user).annotate(
+            feed_date=F('timeline_entries__pub_date'),
+            feed_post=F('timeline_entries__post'),
+        )
+    if horizon is None:
+        return KeysetPaginator(
+            newer, per_page, ordering=FEED_ORDERING, count_limit=count_limit)
+    older = posts.filter(author__in=following).annotate(**by_post)
+    return TimelinePaginator(newer, older, horizon, per_page, count_limit)
@@ -0,0 +1,65 @@
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image, ImageOps
+
+# Параметры сохранения уменьшенного оригинала по форматам.
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+}
+
+
+class BoundedFileUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку на диск кусками и не хранит байты сверх лимита.
+
+    Остаток файла дочитывается из запроса, но не сохраняется, а размер
+    у загруженного файла остается настоящим: по нему формы отклоняют
+    файл, не пытаясь разобрать обрезанное содержимое.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received <= settings.IMAGE_UPLOAD_MAX_BYTES:
+            self.file.write(raw_data)
+
+
+def is_too_large(upload):
+    return upload.size > settings.IMAGE_UPLOAD_MAX_BYTES
+
+
+def has_too_many_pixels(image):
+    """Проверка по заголовку картинки, без декодирования пикселей."""
+    width, height = image.size
+    return width * height > settings.IMAGE_UPLOAD_MAX_PIXELS
+
+
+def downscale(upload):
+    """Уменьшает слишком большой оригинал до IMAGE_MAX_SIDE по длинной стороне.
+
+    JPEG декодируется сразу в уменьшенном виде (draft), поэтому память
+    зависит от итогового размера, а не от исходного.
+    """
+    side = settings.IMAGE_MAX_SIDE
+    upload.seek(0)
+    with Image.open(upload) as image:
+        if max(image.size) <= side:
+            upload.seek(0)
+            return upload
+        image_format = image.format
+        image.draft(image.mode, (side, side))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((side, side))
+        # Безымянный временный файл хранилище копирует, а не переносит,
+        # и он удаляется сам при закрытии.
+        result = tempfile.TemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR)
+        image.save(
+            result, format=image_format,
+            **SAVE_OPTIONS.get(image_format, {}))
+    result.seek(0)
+    return File(result, name=upload.name)
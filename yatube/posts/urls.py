@@ -28,4 +28,5 @@ urlpatterns = [
     ),
     path('create/', views.post_create, name='post_create'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search_posts, name='search'),
 ]
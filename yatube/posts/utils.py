@@ -0,0 +1,22 @@
+from itertools import islice
+
+from django.db import connections
+
+
+def batches(items, size):
+    """Списки по size элементов из любого итератора, последний короче."""
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def in_pool_thread(func, *args):
+    """Вызывает func в потоке пула и закрывает соединения потока."""
+    try:
+        return func(*args)
+    finally:
+        # У потока пула свое соединение, держать его открытым незачем.
+        connections.close_all()
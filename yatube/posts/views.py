@@ -1,43 +1,69 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, Max, Prefetch
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import (
     render,
     get_object_or_404,
     redirect,
 )
-from django.views.decorators.cache import cache_page
 from django.urls import reverse
 
+from . import exporter, search, thumbnails, timeline
+from .freshness import page_condition
+from .cache import cache_feed
 from .forms import PostForm, CommentForm
-from .models import Post, Group, User, Follow
+from .models import Comment, Post, Group, User, Follow, UserStats
+from .paginators import KeysetPaginator
 from yatube.settings import POSTS_IN_PAGE
 
 
-def paginator_page(list, request):
-    return Paginator(
-        list, POSTS_IN_PAGE).get_page(request.GET.get('page'))
+def paginator_page(queryset, request):
+    return KeysetPaginator(
+        queryset, POSTS_IN_PAGE, count_limit=settings.POSTS_COUNT_LIMIT
+    ).get_page(request.GET.get('cursor'))
 
 
-@cache_page(20, key_prefix='index_page')
+@cache_feed('index')
 def index(request):
     return render(request, 'posts/index.html', {
-        'page_obj': paginator_page(Post.objects.all(), request),
+        'page_obj': paginator_page(Post.objects.for_feed(), request),
     })
 
 
+def group_state(request, slug):
+    # Лента меняется правками, удалениями и комментариями, которые не
+    # сдвигают ни одну дату, поэтому Last-Modified у лент нет: свежесть
+    # задают только версии лент в ETag, без запроса к базе.
+    return None, [], [f'group:{slug}']
+
+
+@page_condition(group_state)
+@cache_feed('group:{slug}')
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     return render(request, 'posts/group_list.html', {
         'group': group,
-        'page_obj': paginator_page(group.posts.all(), request),
+        'page_obj': paginator_page(group.posts.for_feed(), request),
     })
 
 
+def profile_state(request, username):
+    return None, [], [f'author:{username}']
+
+
+@page_condition(profile_state)
+@cache_feed('author:{username}')
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
     return render(request, 'posts/profile.html', {
         'author': author,
-        'page_obj': paginator_page(author.posts.all(), request),
+        'stats': UserStats.objects.for_user(author),
+        'page_obj': paginator_page(author.posts.for_feed(), request),
         'following':
             request.user.is_authenticated
             and request.user != author
@@ -46,14 +72,48 @@ def profile(request, username):
     })
 
 
+def post_detail_state(request, post_id):
+    """Пост и его комментарии одним запросом.
+
+    Счетчики автора и готовность миниатюры учитываются версиями лент
+    автора и группы: их сбрасывают те же изменения.
+    """
+    state = Post.objects.filter(pk=post_id).order_by().values_list(
+        'updated', 'author__username', 'group__slug'
+    ).annotate(
+        commented=Max('comments__created'), comments=Count('comments')
+    ).first()
+    if state is None:
+        return None
+    updated, username, slug, commented, comments = state
+    feeds = [f'author:{username}'] + ([f'group:{slug}'] if slug else [])
+    # Токен формы комментария зависит от секрета CSRF: после нового
+    # входа страница с прежним токеном не годится.
+    csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+    return (
+        max(filter(None, [updated, commented])),
+        [updated, commented, comments, csrf],
+        feeds,
+    )
+
+
+@page_condition(post_detail_state)
 def post_detail(request, post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group').prefetch_related(
+            Prefetch('comments', Comment.objects.select_related('author'))
+        ),
+        id=post_id
+    )
     return render(request, 'posts/post_detail.html', {
-        'post': get_object_or_404(Post, id=post_id),
+        'post': post,
+        'author_stats': UserStats.objects.for_user(post.author),
         'form': CommentForm(request.POST or None),
     })
 
 
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -65,12 +125,14 @@ def post_create(request):
     post = form.save(commit=False)
     post.author = request.user
     post.save()
+    thumbnails.schedule(post)
     return redirect(
         reverse('posts:profile', args=[request.user.username])
     )
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     if post.author != request.user:
@@ -88,10 +150,13 @@ def post_edit(request, post_id):
         })
 
     form.save()
+    if 'image' in form.changed_data:
+        thumbnails.schedule(post)
     return redirect('posts:post_detail', post_id)
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -103,17 +168,34 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id)
 
 
+def search_posts(request):
+    """Поиск по тексту постов: сначала самые подходящие."""
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        page_obj = KeysetPaginator(
+            search.search(query, Post.objects.for_feed()),
+            POSTS_IN_PAGE,
+            ordering=('rank', 'pk'),
+        ).get_page(request.GET.get('cursor'))
+    return render(request, 'posts/search.html', {
+        'query': query,
+        'page_obj': page_obj,
+    })
+
+
 @login_required
 def follow_index(request):
     return render(request, 'posts/follow.html', {
-        'page_obj': paginator_page(
-            Post.objects.filter(author__following__user=request.user),
-            request
-        ),
+        'page_obj': timeline.paginator(
+            request.user, POSTS_IN_PAGE,
+            count_limit=settings.POSTS_COUNT_LIMIT,
+        ).get_page(request.GET.get('cursor')),
     })
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     user = request.user
     if user.username != username:
@@ -130,6 +212,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     get_object_or_404(
         Follow, user=request.user,
@@ -138,3 +221,22 @@ def profile_unfollow(request, username):
     return redirect(
         reverse('posts:profile', args=[username])
     )
+
+
+@staff_member_required
+def export_content(request, kind):
+    output_format = request.GET.get('format', 'jsonl')
+    if kind not in exporter.EXPORTS or output_format not in exporter.FORMATS:
+        raise Http404
+    since = request.GET.get('since')
+    try:
+        since = exporter.parse_since(since) if since else None
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    response = StreamingHttpResponse(
+        exporter.export(kind, output_format, since),
+        content_type='application/gzip',
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{exporter.filename(kind, output_format)}"')
+    return response
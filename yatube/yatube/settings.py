@@ -49,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -141,14 +142,55 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_IN_PAGE = 10
+# Число записей в ленте считается не дальше этой границы и тогда
+# показывается как «1000+».
+POSTS_COUNT_LIMIT = 1000
+
+# Лента подписок: посты раскладываются по ящикам подписчиков при публикации.
+TIMELINE_FANOUT = True
+TIMELINE_SIZE = 500
+# Авторы с большим числом подписчиков читаются при просмотре ленты.
+TIMELINE_FANOUT_LIMIT = 1000
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки пишутся на диск кусками; байты сверх лимита не сохраняются.
+FILE_UPLOAD_HANDLERS = ['posts.uploads.BoundedFileUploadHandler']
+IMAGE_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 40 * 10 ** 6
+# Оригиналы больше этого размера по длинной стороне уменьшаются.
+IMAGE_MAX_SIDE = 2560
+
+# Общий для всех воркеров кэш в базе; таблица создается миграцией core.
+# Для другого хранилища достаточно сменить BACKEND и LOCATION.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.DatabaseCache',
+        'LOCATION': 'yatube_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
+
+# Страницы лент сбрасываются сигналами при изменении данных, а не по таймеру.
+FEED_CACHE_TIMEOUT = None
+# Сколько секунд один запрос может пересобирать страницу ленты.
+FEED_CACHE_LOCK_TIMEOUT = 30
+
+# Карточки постов кэшируются по версии поста, срок лишь освобождает место.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# Доля запросов, для которых пишутся замеры и заголовок Server-Timing;
+# итоги видны сотрудникам на /admin/stats/.
+INSTRUMENTATION_SAMPLE_RATE = 0.01
+
+# Миниатюры картинок заранее создает воркер process_thumbnails.
+THUMBNAIL_WORKERS = 2
+
+# Поисковый индекс обновляет воркер process_search_queue, перестраивает
+# команда rebuild_search_index.
+SEARCH_INDEX_WORKERS = 2
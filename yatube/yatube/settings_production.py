@@ -0,0 +1,44 @@
+"""
+Production settings for yatube project.
+
+Usage: DJANGO_SETTINGS_MODULE=yatube.settings_production
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import TEMPLATES
+
+DEBUG = False
+
+# Ключ из settings.py лежит в репозитории и в production не годится.
+SECRET_KEY = os.environ.get('SECRET_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured(
+        'Задайте SECRET_KEY в переменной окружения')
+
+ALLOWED_HOSTS = os.environ.get(
+    'ALLOWED_HOSTS', 'localhost 127.0.0.1 [::1]').split()
+
+# Скомпилированные шаблоны хранятся в памяти процесса; явный список
+# загрузчиков требует APP_DIRS = False.
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            **TEMPLATES[0]['OPTIONS'],
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+        },
+    },
+]
+
+# Все шаблоны компилируются при старте WSGI-приложения.
+TEMPLATES_WARMUP = True
@@ -3,10 +3,20 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import instrumentation_stats
+from posts.views import export_content
+
 urlpatterns = [
+    path(
+        'admin/stats/', instrumentation_stats, name='instrumentation_stats'
+    ),
+    path(
+        'admin/export/<str:kind>/', export_content, name='export_content'
+    ),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
+    path('api/v1/', include('posts.api_urls', namespace='api')),
     path('', include('posts.urls', namespace='posts')),
     path('about/', include('about.urls', namespace='about'))
 ]